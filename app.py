@@ -1,17 +1,43 @@
+import gzip
+import hashlib
+import hmac
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta, timezone
+from time import perf_counter
 
 import dotenv
-from flask import Flask, make_response, render_template, request
+from flask import Flask, get_template_attribute, jsonify, make_response, render_template, request
 from flask_compress import Compress
 from flask_talisman import Talisman
 
+from modules.Catalog import FILM_FILTERS, SHOWTIME_FILTERS, Catalog, time_to_minutes
+from modules.Geo import GeoIndex
+from modules.Profiling import profiler
+from modules.Storage import (
+    DATA_DIR,
+    MANIFEST_FILE,
+    join_day,
+    manifest_sources,
+    read_json,
+    read_snapshot,
+    write_snapshot,
+)
+from modules.Watcher import SnapshotWatcher
+
+try:
+    import brotli
+except ImportError:  # Brotli est optionnel : gzip seul dans ce cas
+    brotli = None
+
 dotenv.load_dotenv(".env")
 dotenv.load_dotenv(".env.sample")
 
 WEBSITE_TITLE = os.environ.get("WEBSITE_TITLE", "CinéLyon")
 MAPBOX_TOKEN = os.environ.get("MAPBOX_TOKEN", "")
+RELOAD_TOKEN = os.environ.get("RELOAD_TOKEN", "")
+# Instantané binaire écrit au premier chargement s'il manque ou est en retard (jamais si data/ est en lecture seule)
+WRITE_SNAPSHOT = os.environ.get("WRITE_SNAPSHOT", "1") == "1"
 
 theaters_json = json.loads(os.environ.get("THEATERS", "[]"))
 theater_locations = []
@@ -22,49 +48,252 @@ for theater in theaters_json:
             "description": theater["name"],
         }
     )
+theater_index = GeoIndex(theaters_json)
+
+_shard_cache = {}  # fichier de données -> (sha256, contenu) : seuls les fichiers modifiés sont relus
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), DATA_DIR)
+
+API_DEFAULT_LIMIT = 50
+API_MAX_LIMIT = 200
+NEARBY_DEFAULT_RADIUS_KM = 5
+NEARBY_MAX_RADIUS_KM = 50
+SOON_DEFAULT_MINUTES = 90
+SOON_MAX_MINUTES = 360
+BIENTOT_LIMIT = 12  # Séances de la section « Bientôt » de la page d'accueil
+
+# Pages HTML rendues et précompressées, par (delta, mtime du manifeste, date du jour)
+PAGE_CACHE_MAX_ENTRIES = 32
+_page_cache = {}
 
-_showtimes_data = None
-_last_load_time = None
-_movies_file_mtime = None
 
+def read_shard(name: str, sha256: str):
+    """Contenu d'un fichier de données, relu seulement si son empreinte dans le manifeste a changé."""
+    cached = _shard_cache.get(name)
+    if cached is not None and cached[0] == sha256:
+        return cached[1]
+    data = read_json(os.path.join(DATA_PATH, name))
+    _shard_cache[name] = (sha256, data)
+    return data
 
-def load_movies_data(force_reload=False):
-    """Charge les données des films depuis movies.json avec cache intelligent."""
-    global _showtimes_data, _last_load_time, _movies_file_mtime
 
-    movies_file = os.path.join(os.path.dirname(__file__), "movies.json")
+def data_version():
+    """Version des données : mtime du manifeste (None s'il manque) et date du jour (libellés des dates)."""
+    try:
+        mtime = os.path.getmtime(os.path.join(DATA_PATH, MANIFEST_FILE))
+    except OSError:
+        mtime = None
+    return mtime, date.today()
 
-    if not os.path.exists(movies_file):
-        print("⚠️ movies.json non trouvé, retour de données vides")
-        return {"showtimes": [], "num_days": 0}
 
-    current_mtime = os.path.getmtime(movies_file)
+def build_snapshot(previous: dict | None, version: tuple, force: bool) -> dict:
+    """Construit les données servies depuis data/, hors du chemin des requêtes (thread de surveillance).
 
-    if not force_reload and _showtimes_data is not None:
-        if _movies_file_mtime == current_mtime:
-            return _showtimes_data
+    L'instantané binaire (séances en colonnes et index de l'API précalculés) est utilisé s'il correspond
+    au manifeste ; sinon seuls les jours (et la table des films) dont l'empreinte a changé sont relus.
+    Si seul le jour a changé (passage à minuit), rien n'est relu : voir `build_days`."""
+    current_mtime, today = version
 
-    with open(movies_file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    if current_mtime is None:
+        print("⚠️ data/manifest.json non trouvé, retour de données vides")
+        return build_days({}, today, None)
 
-    print(f"✅ Données chargées depuis movies.json (généré le {data.get('generated_at', 'inconnu')})")
+    if not force and previous is not None and previous["mtime"] == current_mtime and previous["today"] <= today:
+        with profiler.phase("views"):
+            views = build_days(previous["days"], today, current_mtime, previous["views"], previous["catalog"].state())
+        return {**previous, **views}
 
-    showtimes = []
-    for day in data.get("days", []):
-        showtimes.append(day.get("movies", []))
+    if force:
+        _shard_cache.clear()
 
-    num_days = len(showtimes)
+    started = perf_counter()
+    manifest = read_json(os.path.join(DATA_PATH, MANIFEST_FILE))
+    snapshot = read_snapshot(manifest, DATA_PATH)
 
-    _showtimes_data = {"showtimes": showtimes, "num_days": num_days}
-    _last_load_time = datetime.now()
-    _movies_file_mtime = current_mtime
+    if snapshot is not None:
+        days = snapshot["days"]
+        catalog_state = snapshot["catalog"]
+        source = "instantané"
+    else:
+        films = read_shard(manifest["films"]["file"], manifest["films"]["sha256"])
+        days = [join_day(films, read_shard(day["file"], day["sha256"])) for day in manifest["days"]]
 
-    print(f"📊 {num_days} jour(s) de données disponibles")
+        # Oublier les fichiers qui ne sont plus dans le manifeste
+        current_files = {manifest["films"]["file"]} | {day["file"] for day in manifest["days"]}
+        for name in set(_shard_cache) - current_files:
+            del _shard_cache[name]
+        catalog_state = None
+        source = "JSON"
 
-    return _showtimes_data
+    print(f"✅ Données chargées depuis data/ (générées le {manifest.get('generated_at', 'inconnu')})")
 
+    data = {
+        "loaded_at": datetime.now(),
+        **build_days(
+            {date.fromisoformat(day["date"]): day["movies"] for day in days},
+            today,
+            current_mtime,
+            catalog_state=catalog_state,
+        ),
+    }
+
+    # Sur un disque en lecture seule (Vercel), l'instantané n'est même pas construit : il vient du scraper
+    if snapshot is None and WRITE_SNAPSHOT and os.access(DATA_PATH, os.W_OK):
+        save_snapshot(manifest, days, data["catalog"])
+
+    print(f"📊 {data['num_days']} jour(s) de données à venir sur {len(days)}")
+    if days and not data["num_days"]:
+        print(f"⚠️ Aucune séance à venir : dernier jour des données le {days[-1]['date']}")
+    print(f"⏱️ Chargement et index en {(perf_counter() - started) * 1000:.0f} ms ({source})")
+
+    return data
+
+
+def save_snapshot(manifest: dict, days: list[dict], catalog: Catalog) -> None:
+    """Écrit l'instantané binaire des données relues en JSON, pour accélérer les prochains démarrages.
+
+    Le catalogue déjà construit est réutilisé s'il couvre tous les jours (aucun jour passé retiré)."""
+    if catalog.dates != [date.fromisoformat(day["date"]) for day in days]:
+        catalog = None
+    try:
+        with profiler.phase("snapshot"):
+            write_snapshot(days, manifest["generated_at"], manifest_sources(manifest), DATA_PATH, catalog)
+        print("💾 Instantané binaire écrit")
+    except OSError as e:
+        print(f"⚠️ Instantané binaire non écrit : {e}")
+
+
+data_watcher = SnapshotWatcher(data_version, build_snapshot)
+
+
+def load_movies_data(force_reload=False):
+    """Données courantes, publiées par le thread de surveillance : ni appel système ni relecture ici.
+
+    Seuls le premier chargement et `force_reload` construisent sur le thread appelant. Au passage à
+    minuit, la première requête reconstruit les vues si le thread ne l'a pas déjà fait ; les requêtes
+    concurrentes gardent l'instantané de la veille en attendant."""
+    if force_reload:
+        data_watcher.refresh(force=True)
+    data = data_watcher.current
+    if data is None:
+        data_watcher.refresh()
+        data = data_watcher.current
+    elif data["today"] != date.today():
+        data_watcher.refresh(wait=False)
+        data = data_watcher.current
+    data_watcher.ensure_started()
+    return data
+
+
+def date_labels(day: date) -> dict:
+    """Libellés d'un jour, indépendants de la date du jour (les vues restent valables après minuit)."""
+    return {
+        "jour": translateDay(day.weekday()),
+        "chiffre": day.day,
+        "mois": translateMonth(day.month),
+        "full_date": day.strftime("%d/%m"),
+        "iso": day.isoformat(),
+    }
+
+
+def build_days(
+    days: dict[date, list[dict]],
+    today: date,
+    mtime: float | None,
+    views: dict | None = None,
+    catalog_state: dict | None = None,
+) -> dict:
+    """Indexe les séances par date, sans les jours passés, avec une vue par date, la vue « tous les jours »
+    et les index de l'API.
+
+    Au passage à minuit, `views` (vues par date déjà calculées) sont conservées : seules la vue « tous les
+    jours » et les index de l'API, qui couvrent les jours retirés, sont reconstruits. `catalog_state`
+    (index précalculés de l'instantané binaire) n'est utilisable que si aucun jour n'est retiré."""
+    kept = {day: movies for day, movies in sorted(days.items()) if day >= today}
+
+    date_views = {
+        day: views[day] if views and day in views else build_view([(day, movies)]) for day, movies in kept.items()
+    }
+    dates = [{**date_labels(day), "index": (day - today).days} for day in kept]
+
+    version = hashlib.sha1(f"{mtime}|{today}".encode()).hexdigest()[:10]
+    if catalog_state is not None and len(kept) == len(days):
+        catalog = Catalog.from_state(catalog_state, list(kept), version)
+    else:
+        catalog = Catalog(list(kept.items()), version=version)
+
+    return {
+        "days": kept,
+        "num_days": len(kept),
+        "mtime": mtime,
+        "today": today,
+        "dates": dates,
+        "views": {None: build_view(list(kept.items())), **date_views},
+        "catalog": catalog,
+    }
+
+
+def build_view(days: list[tuple[date, list[dict]]]) -> dict:
+    """Fusionne les films des jours demandés (séances par jour) et calcule les listes de filtres."""
+    all_films = {}
+    day_isos = {}
+
+    for day, movies in days:
+        labels = date_labels(day)
+        day_label = f"{labels['jour']} {labels['chiffre']} {labels['mois']}"
+        day_isos[day_label] = labels["iso"]
+        for film in movies:
+            title = film["title"]
+            if title not in all_films:
+                all_films[title] = {
+                    "title": film["title"],
+                    "release_year": film["release_year"],
+                    "duree": film["duree"],
+                    "rating": film["rating"],
+                    "genres": film["genres"],
+                    "realisateur": film["realisateur"],
+                    "synopsis": film["synopsis"],
+                    "affiche": film["affiche"],
+                    "director": film["director"],
+                    "wantToSee": film["wantToSee"],
+                    "url": film["url"],
+                    "seances_by_day": {},
+                }
+
+            if day_label not in all_films[title]["seances_by_day"]:
+                all_films[title]["seances_by_day"][day_label] = {}
+
+            for cinema, seances in film["seances"].items():
+                if cinema not in all_films[title]["seances_by_day"][day_label]:
+                    all_films[title]["seances_by_day"][day_label][cinema] = []
+                all_films[title]["seances_by_day"][day_label][cinema].extend(seances)
+
+    films_list = sorted(all_films.values(), key=lambda x: x["wantToSee"], reverse=True)
+
+    all_genres = set()
+    all_directors = set()
+    all_cinemas = set()
+
+    for film in films_list:
+        if film["genres"]:
+            for genre in film["genres"].split(", "):
+                if genre.strip():
+                    all_genres.add(genre.strip())
+        if film["director"] and film["director"] != "Inconnu":
+            all_directors.add(film["director"])
+        for day_seances in film["seances_by_day"].values():
+            for cinema in day_seances.keys():
+                all_cinemas.add(cinema)
+
+    return {
+        "films": films_list,
+        "by_title": all_films,
+        "day_isos": day_isos,
+        "all_genres": sorted(all_genres),
+        "all_directors": sorted(all_directors),
+        "all_cinemas": sorted(all_cinemas),
+    }
 
-load_movies_data()
 
 app = Flask(__name__)
 
@@ -100,6 +329,10 @@ def add_cache_headers(response):
     return response
 
 
+# Server-Timing, histogrammes (/metrics) et profils des requêtes lentes si APP_PROFILING=1
+profiler.init_app(app)
+
+
 def optimize_poster_url(url: str, width: int = 200) -> str:
     """Optimise l'URL d'une affiche via le proxy wsrv.nl."""
     if not url or url.startswith("/static"):
@@ -158,16 +391,31 @@ def translateDay(weekday: int):
             return "???"
 
 
+load_movies_data()
+
+
 @app.route("/health")
 def health():
     return "OK"
 
 
-@app.route("/reload")
+@app.route("/reload", methods=["GET", "POST"])
 def reload_data():
-    """Endpoint pour forcer le rechargement des données."""
-    data = load_movies_data(force_reload=True)
-    return f"Données rechargées: {data['num_days']} jours"
+    """Force le rechargement des données (`Authorization: Bearer $RELOAD_TOKEN`), au plus une fois par RELOAD_DEBOUNCE.
+
+    Les autres requêtes continuent d'être servies par l'instantané courant pendant la reconstruction."""
+    if not RELOAD_TOKEN:
+        return "Not Found", 404
+    header = request.headers.get("Authorization", "")
+    if not hmac.compare_digest(header.encode(), f"Bearer {RELOAD_TOKEN}".encode()):
+        return "Unauthorized", 401, {"WWW-Authenticate": "Bearer"}
+
+    status = data_watcher.reload()
+    if status == "debounced":
+        return "Rechargement trop récent", 429, {"Retry-After": str(data_watcher.retry_after())}
+    if status == "busy":
+        return "Rechargement déjà en cours", 202
+    return f"Données rechargées: {data_watcher.current['num_days']} jours"
 
 
 @app.route("/robots.txt")
@@ -193,12 +441,10 @@ def sitemap_xml():
 
 @app.route("/")
 def home():
-    data = load_movies_data()
-    showtimes = data["showtimes"]
-    num_days = data["num_days"]
-
+    with profiler.phase("load"):
+        data = load_movies_data()
     delta = request.args.get("delta", default=None, type=int)
-    max_delta = num_days - 1 if num_days > 0 else 0
+    max_delta = data["dates"][-1]["index"] if data["dates"] else 0
 
     if delta is not None:
         if delta > max_delta:
@@ -206,83 +452,330 @@ def home():
         if delta < 0:
             delta = 0
 
-    dates = []
-    for i in range(num_days):
-        day = datetime.today() + timedelta(i)
-        dates.append(
-            {
-                "jour": translateDay(day.weekday()),
-                "chiffre": day.day,
-                "mois": translateMonth(day.month),
-                "choisi": delta == i,
-                "index": i,
-                "full_date": day.strftime("%d/%m"),
-            }
-        )
+    key = (delta, data["mtime"], data["today"])
+    entry = _page_cache.get(key)
+    profiler.note("cache", "hit" if entry is not None else "miss")
+
+    if entry is None:
+        dates = [{**day, "choisi": delta == day["index"]} for day in data["dates"]]
+        view = data["views"][None] if delta is None else data["views"].get(data["today"] + timedelta(delta))
+        if view is None:  # Jour sans séance dans les données
+            view = data["views"][None]
+
+        with profiler.phase("render"):
+            html = render_template(
+                "index.html",
+                page_actuelle="home",
+                films=view["films"],
+                dates=dates,
+                show_all=(delta is None),
+                theater_locations=theater_locations,
+                website_title=WEBSITE_TITLE,
+                mapbox_token=MAPBOX_TOKEN,
+                all_genres=view["all_genres"],
+                all_directors=view["all_directors"],
+                all_cinemas=view["all_cinemas"],
+                day_isos=view["day_isos"],
+                inline_day=data["dates"][0]["iso"] if data["dates"] else None,
+            )
+        with profiler.phase("compress"):
+            entry = build_page_entry(html.encode("utf-8"), data["mtime"], data["today"])
+
+        if len(_page_cache) >= PAGE_CACHE_MAX_ENTRIES:
+            _page_cache.clear()
+        _page_cache[key] = entry
+
+    return page_response(entry)
+
+
+def build_page_entry(body: bytes, mtime: float | None, today: date) -> dict:
+    """Précompresse une page rendue (gzip et brotli) et calcule ses validateurs HTTP.
+
+    Le corps non compressé n'est pas gardé : il est redécompressé pour les rares clients sans gzip.
+    La page dépend du fichier et du jour (libellés de dates) : Last-Modified est le plus récent des deux."""
+    midnight = datetime.combine(today, time.min).timestamp()
+    return {
+        "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+        "br": brotli.compress(body, quality=9) if brotli else None,
+        "etag": hashlib.sha256(body).hexdigest()[:32],
+        "last_modified": datetime.fromtimestamp(max(mtime or 0, midnight), timezone.utc),
+    }
+
+
+def page_response(entry: dict):
+    """Réponse depuis le cache de pages, avec ETag fort par encodage et réponse 304 si inchangée."""
+    if entry["br"] and request.accept_encodings["br"]:
+        encoding, body = "br", entry["br"]
+    elif request.accept_encodings["gzip"]:
+        encoding, body = "gzip", entry["gzip"]
+    else:
+        encoding, body = None, gzip.decompress(entry["gzip"])
+
+    response = make_response(body)
+    response.headers["Content-Type"] = "text/html; charset=utf-8"
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.set_etag(f"{entry['etag']}-{encoding or 'identity'}")
+    response.last_modified = entry["last_modified"]
+
+    return response.make_conditional(request)
+
+
+@app.route("/fragments/seances")
+def seances_fragment():
+    """Séances d'un film pour un jour (`day` en date ISO), chargées à la demande par la vue « tous les jours »."""
+    with profiler.phase("load"):
+        data = load_movies_data()
+    title = request.args.get("film", "")
+    try:
+        day = data["catalog"].day_index(request.args.get("day", ""))
+    except ValueError:
+        return "Jour inconnu", 404
+
+    film = data["views"][data["catalog"].dates[day]]["by_title"].get(title)
+    if film is None:
+        return "Film inconnu", 404
+
+    day_label, cinemas = next(iter(film["seances_by_day"].items()))
+    with profiler.phase("render"):
+        seances_list = get_template_attribute("_seances.html", "seances_list")
+        response = make_response(seances_list(film, day_label, cinemas))
+    response.headers["Cache-Control"] = "no-cache"
+    response.set_etag(hashlib.sha1(f"{data['catalog'].version}|{day}|{title}".encode()).hexdigest()[:16])
+    return response.make_conditional(request)
+
+
+def parse_api_query(catalog: Catalog) -> dict:
+    """Lit les paramètres communs de l'API (filtres, fenêtre horaire, curseur, limite) ; ValueError si invalides."""
+    args = request.args
+    filters = catalog.normalize_filters({field: args.get(field) for field in SHOWTIME_FILTERS + FILM_FILTERS})
+    limit = args.get("limit", default=API_DEFAULT_LIMIT, type=int)
+    return {
+        "filters": filters,
+        "start": time_to_minutes(args["from"]) if args.get("from") else None,
+        "end": time_to_minutes(args["to"]) if args.get("to") else None,
+        "after": catalog.decode_cursor(args.get("cursor")),
+        "limit": min(max(limit, 1), API_MAX_LIMIT),
+    }
+
+
+@app.route("/api/films")
+def api_films():
+    """Films filtrés par jour, cinéma, genre, réalisateur, langue, format et fenêtre horaire (paginés)."""
+    with profiler.phase("load"):
+        catalog = load_movies_data()["catalog"]
+    try:
+        query = parse_api_query(catalog)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with profiler.phase("query"):
+        film_ids, last_id = catalog.query_films(**query)
+    return jsonify(
+        {
+            "films": [catalog.film_json(film_id) for film_id in film_ids],
+            "next_cursor": catalog.encode_cursor(last_id),
+        }
+    )
 
-    all_films = {}
-    days_to_show = [delta] if delta is not None else range(num_days)
 
-    for day_index in days_to_show:
-        if day_index >= len(showtimes):
-            continue
-        day_label = f"{dates[day_index]['jour']} {dates[day_index]['chiffre']} {dates[day_index]['mois']}"
-        for film in showtimes[day_index]:
-            title = film["title"]
-            if title not in all_films:
-                all_films[title] = {
-                    "title": film["title"],
-                    "release_year": film["release_year"],
-                    "duree": film["duree"],
-                    "rating": film["rating"],
-                    "genres": film["genres"],
-                    "realisateur": film["realisateur"],
-                    "synopsis": film["synopsis"],
-                    "affiche": film["affiche"],
-                    "director": film["director"],
-                    "wantToSee": film["wantToSee"],
-                    "url": film["url"],
-                    "seances_by_day": {},
-                }
+@app.route("/api/showtimes")
+def api_showtimes():
+    """Séances filtrées (mêmes paramètres que /api/films, plus `film`), triées par jour et heure (paginées)."""
+    with profiler.phase("load"):
+        catalog = load_movies_data()["catalog"]
+    try:
+        query = parse_api_query(catalog)
+        film = request.args.get("film", type=int)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with profiler.phase("query"):
+        row_ids, last_id = catalog.query_showtimes(film=film, **query)
+    return jsonify(
+        {
+            "showtimes": [catalog.showtime_json(row_id) for row_id in row_ids],
+            "next_cursor": catalog.encode_cursor(last_id),
+        }
+    )
 
-            if day_label not in all_films[title]["seances_by_day"]:
-                all_films[title]["seances_by_day"][day_label] = {}
 
-            for cinema, seances in film["seances"].items():
-                if cinema not in all_films[title]["seances_by_day"][day_label]:
-                    all_films[title]["seances_by_day"][day_label][cinema] = []
-                all_films[title]["seances_by_day"][day_label][cinema].extend(seances)
+@app.route("/api/search")
+def api_search():
+    """Films dont le titre, le titre original, le réalisateur, les genres ou le synopsis contiennent les mots de `q`.
+
+    Insensible aux accents et à la casse, complète le dernier mot tapé et tolère les fautes de frappe."""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "paramètre q requis"}), 400
+    limit = min(max(request.args.get("limit", default=20, type=int), 1), API_MAX_LIMIT)
+
+    with profiler.phase("load"):
+        data = load_movies_data()
+    with profiler.phase("query"):
+        results = data["catalog"].search.search(query, limit)
+    catalog = data["catalog"]
+    return jsonify({"films": [{**catalog.film_json(film_id), "score": score} for film_id, score in results]})
+
+
+def float_param(args, name: str, default: float | None = None) -> float:
+    """Paramètre numérique ; ValueError avec un message fixe (le texte de l'erreur de float() n'est pas renvoyé)."""
+    try:
+        return float(args.get(name) or default)
+    except (TypeError, ValueError):
+        raise ValueError(f"paramètre {name} invalide") from None
+
+
+def parse_location(args) -> tuple[float, float, float]:
+    """Lit `lat`, `lon` et `radius` (km, plafonné à NEARBY_MAX_RADIUS_KM) ; ValueError si absents ou invalides."""
+    if not args.get("lat") or not args.get("lon"):
+        raise ValueError("paramètres lat et lon requis")
+    lat, lon = float_param(args, "lat"), float_param(args, "lon")
+    radius = float_param(args, "radius", NEARBY_DEFAULT_RADIUS_KM)
+    if not -90 <= lat <= 90:
+        raise ValueError("paramètre lat invalide")
+    if not -180 <= lon <= 180:
+        raise ValueError("paramètre lon invalide")
+    if not radius > 0:
+        raise ValueError("paramètre radius invalide")
+    return lat, lon, min(radius, NEARBY_MAX_RADIUS_KM)
+
+
+@app.route("/api/nearby")
+def api_nearby():
+    """Séances des cinémas à moins de `radius` km de (`lat`, `lon`), triées par distance puis horaire.
+
+    Par défaut les séances du jour à partir de maintenant ; `day`, `from`, `to` et les filtres de /api/films
+    (hors `cinema`) s'appliquent comme ailleurs."""
+    with profiler.phase("load"):
+        data = load_movies_data()
+    catalog = data["catalog"]
+    args = request.args
+    try:
+        lat, lon, radius = parse_location(args)
+        fields = [field for field in SHOWTIME_FILTERS + FILM_FILTERS if field != "cinema"]
+        filters = catalog.normalize_filters({field: args.get(field) for field in fields})
+        day = filters.get("day", catalog.date_positions.get(data["today"]))
+        now = datetime.now()
+        upcoming = day is not None and catalog.dates[day] == now.date() and not args.get("from")
+        start = now.hour * 60 + now.minute if upcoming else time_to_minutes(args["from"]) if args.get("from") else None
+        end = time_to_minutes(args["to"]) if args.get("to") else None
+        limit = min(max(args.get("limit", default=API_DEFAULT_LIMIT, type=int), 1), API_MAX_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with profiler.phase("query"):
+        cinemas, showtimes = [], []
+        for distance, theater in theater_index.nearby(lat, lon, radius):
+            distance = round(distance, 2)
+            cinemas.append(
+                {
+                    "name": theater["name"],
+                    "distance_km": distance,
+                    "latitude": theater["latitude"],
+                    "longitude": theater["longitude"],
+                }
+            )
+            if day is None or len(showtimes) >= limit:
+                continue  # Pas de séance ce jour-là, ou page complète : seuls les cinémas sont listés
+            row_ids, _ = catalog.query_showtimes(
+                {**filters, "day": day, "cinema": theater["name"].lower()},
+                start=start,
+                end=end,
+                limit=limit - len(showtimes),
+            )
+            showtimes.extend({**catalog.showtime_json(row_id), "distance_km": distance} for row_id in row_ids)
+    return jsonify({"cinemas": cinemas, "showtimes": showtimes})
+
+
+def starting_soon(data: dict, within: int, filters: dict, cinemas: list[str] | None = None) -> list[tuple[int, int]]:
+    """Séances commençant dans les `within` prochaines minutes, par heure de début : [(séance, minutes restantes)].
+
+    La fenêtre continue sur le lendemain si elle passe minuit ; `cinemas` (noms en minuscules) la restreint
+    à ces cinémas. Chaque fenêtre est une recherche dichotomique dans une frise horaire du catalogue."""
+    catalog = data["catalog"]
+    now = datetime.now()
+    start = now.hour * 60 + now.minute
+    windows = [(0, start, min(start + within, 24 * 60 - 1))]
+    if start + within >= 24 * 60:
+        windows.append((1, 0, start + within - 24 * 60))
+
+    result = []
+    for offset, first, last in windows:
+        day = catalog.date_positions.get(data["today"] + timedelta(offset))
+        if day is None:
+            continue
+        row_ids = []
+        for cinema in cinemas if cinemas is not None else [filters.get("cinema")]:
+            window_filters = {**filters, "cinema": cinema} if cinema else filters
+            row_ids.extend(catalog.starting_between(day, first, last, window_filters))
+        # Identifiants numérotés par jour puis heure : trier les séances de plusieurs cinémas les remet dans l'ordre
+        result.extend((row_id, offset * 24 * 60 + catalog.rows[row_id][1] - start) for row_id in sorted(row_ids))
+    return result
+
+
+@app.route("/api/soon")
+def api_soon():
+    """Séances commençant dans les `within` prochaines minutes (90 par défaut), par heure de début.
+
+    Avec `lat` et `lon`, seulement dans les cinémas à moins de `radius` km ; `cinema`, `lang`, `format`, `genre`
+    et `director` filtrent comme pour /api/showtimes."""
+    with profiler.phase("load"):
+        data = load_movies_data()
+    catalog = data["catalog"]
+    args = request.args
+    try:
+        within = min(max(args.get("within", default=SOON_DEFAULT_MINUTES, type=int), 1), SOON_MAX_MINUTES)
+        fields = [field for field in SHOWTIME_FILTERS + FILM_FILTERS if field != "day"]
+        filters = catalog.normalize_filters({field: args.get(field) for field in fields})
+        distances = None
+        if args.get("lat") or args.get("lon"):
+            distances = {
+                theater["name"].lower(): round(distance, 2)
+                for distance, theater in theater_index.nearby(*parse_location(args))
+            }
+        limit = min(max(args.get("limit", default=API_DEFAULT_LIMIT, type=int), 1), API_MAX_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    films_list = sorted(all_films.values(), key=lambda x: x["wantToSee"], reverse=True)
+    with profiler.phase("query"):
+        cinemas = None
+        if distances is not None:
+            cinemas = [cinema for cinema in distances if filters.get("cinema", cinema) == cinema]
+        upcoming = starting_soon(data, within, filters, cinemas)[:limit]
 
-    all_genres = set()
-    all_directors = set()
-    all_cinemas = set()
+    showtimes = []
+    for row_id, starts_in in upcoming:
+        showtime = {**catalog.showtime_json(row_id), "starts_in": starts_in}
+        if distances is not None:
+            showtime["distance_km"] = distances[showtime["cinema"].lower()]
+        showtimes.append(showtime)
+    return jsonify({"within": within, "showtimes": showtimes})
+
+
+@app.route("/fragments/bientot")
+def bientot_fragment():
+    """Section « Bientôt » de la page d'accueil : prochaines séances, chargée à part car elle change chaque minute."""
+    with profiler.phase("load"):
+        data = load_movies_data()
+    catalog = data["catalog"]
+    with profiler.phase("query"):
+        upcoming = starting_soon(data, SOON_DEFAULT_MINUTES, {})[:BIENTOT_LIMIT]
+    if not upcoming:
+        return "", 204
 
-    for film in films_list:
-        if film["genres"]:
-            for genre in film["genres"].split(", "):
-                if genre.strip():
-                    all_genres.add(genre.strip())
-        if film["director"] and film["director"] != "Inconnu":
-            all_directors.add(film["director"])
-        for day_seances in film["seances_by_day"].values():
-            for cinema in day_seances.keys():
-                all_cinemas.add(cinema)
+    showtimes = []
+    for row_id, starts_in in upcoming:
+        showtime = catalog.showtime_json(row_id)
+        film = catalog.film_json(showtime["film_id"])
+        showtimes.append({**showtime, "starts_in": starts_in, "url": film["url"]})
+    with profiler.phase("render"):
+        response = make_response(render_template("_bientot.html", showtimes=showtimes, within=SOON_DEFAULT_MINUTES))
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return response
 
-    return render_template(
-        "index.html",
-        page_actuelle="home",
-        films=films_list,
-        dates=dates,
-        show_all=(delta is None),
-        theater_locations=theater_locations,
-        website_title=WEBSITE_TITLE,
-        mapbox_token=MAPBOX_TOKEN,
-        all_genres=sorted(all_genres),
-        all_directors=sorted(all_directors),
-        all_cinemas=sorted(all_cinemas),
-    )
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Faux serveur Allociné/TMDB : rejoue les fixtures enregistrées, avec latence, 429, 5xx et timeouts injectés.
+
+Deux ports (un par service, donc deux hôtes distincts pour le transport et ses limiteurs) servent les
+mêmes routes : séances Allociné paginées, localization_city, search/movie, movie/{id} et movie/{id}/credits.
+
+    python benchmarks/fake_upstream.py --latency 0.05 --rate-429 0.05 --rate-5xx 0.05 --rate-timeout 0.01
+
+    ALLOCINE_BASE_URL=http://127.0.0.1:8801 TMDB_BASE_URL=http://127.0.0.1:8802/3 TMDB_API_KEY=fake \\
+    THEATERS="$(python benchmarks/fake_upstream.py --print-theaters 60)" HTTP_CACHE_DIR= python scrape.py
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FIXTURE_DATE = "2026-10-17"  # Date des séances enregistrées, remplacée par la date demandée
+PAGES_PER_DAY = 3
+ALLOCINE_PORT = 8801
+TMDB_PORT = 8802
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def theaters_config(count: int) -> list[dict]:
+    """Configuration THEATERS de `count` cinémas fictifs (identifiants F0000, F0001...)."""
+    return [
+        {"name": f"Cinéma fictif {i}", "id": f"F{i:04d}", "latitude": 45.75, "longitude": 4.85} for i in range(count)
+    ]
+
+
+class Upstream:
+    """Réponses des deux services à partir des fixtures : (statut, corps JSON) pour un chemin et ses paramètres."""
+
+    def __init__(self, pages_per_day: int = PAGES_PER_DAY) -> None:
+        self.pages = {page: self._showtimes_page(page, pages_per_day) for page in range(1, pages_per_day + 1)}
+        self.localization = load_fixture("allocine_localization_city.json")
+        self.tmdb_search = load_fixture("tmdb_search.json")
+        self.tmdb_movie = load_fixture("tmdb_movie.json")
+
+    @staticmethod
+    def _showtimes_page(page: int, total_pages: int) -> bytes:
+        """Page `page` : les films enregistrés, renommés et renumérotés pour que chaque page soit distincte."""
+        data = load_fixture("allocine_showtimes.json")
+        for result in data["results"]:
+            if page > 1:
+                result["movie"]["internalId"] += 1000 * page
+                result["movie"]["title"] = f"{result['movie']['title']} ({page})"
+        data["pagination"]["page"] = page
+        data["pagination"]["totalPages"] = total_pages
+        return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    def route(self, path: str, query: dict[str, list[str]]) -> tuple[int, bytes]:
+        showtimes = re.search(r"/_/showtimes/theater-(\w+)/d-([\d-]+)/p-(\d+)/?$", path)
+        if showtimes:
+            page = self.pages.get(int(showtimes.group(3)))
+            if page is None:
+                return 404, b'{"error": true}'
+            return 200, page.replace(FIXTURE_DATE.encode(), showtimes.group(2).encode())
+
+        if re.search(r"/_/localization_city/", path):
+            return 200, json.dumps(self.localization, ensure_ascii=False).encode("utf-8")
+
+        if path.endswith("/search/movie"):
+            title = query.get("query", [""])[0]
+            results = [{**result, "title": title, "original_title": title} for result in self.tmdb_search["results"]]
+            return 200, json.dumps({**self.tmdb_search, "results": results}).encode("utf-8")
+
+        movie = re.search(r"/movie/(\d+)(/credits)?/?$", path)
+        if movie:
+            movie_id = int(movie.group(1))
+            if movie.group(2):
+                return 200, json.dumps({**self.tmdb_movie["credits"], "id": movie_id}).encode("utf-8")
+            data = {**self.tmdb_movie, "id": movie_id}
+            if "credits" not in query.get("append_to_response", [""])[0].split(","):
+                del data["credits"]
+            return 200, json.dumps(data).encode("utf-8")
+
+        return 404, b'{"error": true}'
+
+
+@dataclass
+class Faults:
+    """Pannes injectées : latence (secondes, avec jitter), et probabilités de 429, 5xx et timeout par requête."""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    rate_429: float = 0.0
+    rate_5xx: float = 0.0
+    rate_timeout: float = 0.0
+    timeout_delay: float = 30.0  # Au-delà du timeout de lecture du transport (HTTP_READ_TIMEOUT)
+    retry_after: float | None = 1.0  # En-tête Retry-After des 429 (None = absent)
+    seed: int | None = None
+
+    def __post_init__(self) -> None:
+        self._random = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> tuple[float, str | None]:
+        """Latence et panne ("429", "500", "502", "503", "timeout" ou None) de la prochaine requête."""
+        with self._lock:
+            latency = self.latency + self._random.uniform(0, self.jitter)
+            roll = self._random.random()
+            server_error = self._random.choice(("500", "502", "503"))
+        for fault, rate in (("429", self.rate_429), (server_error, self.rate_5xx), ("timeout", self.rate_timeout)):
+            if roll < rate:
+                return latency, fault
+            roll -= rate
+        return latency, None
+
+
+class FakeUpstreamServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], upstream: Upstream, faults: Faults, verbose: bool = False) -> None:
+        super().__init__(address, FakeUpstreamHandler)
+        self.upstream = upstream
+        self.faults = faults
+        self.verbose = verbose
+        self.stats: Counter = Counter()
+        self.stats_lock = threading.Lock()
+
+    def count(self, *keys: str) -> None:
+        with self.stats_lock:
+            self.stats.update(keys)
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    server: FakeUpstreamServer
+    protocol_version = "HTTP/1.1"  # Keep-alive, comme les vrais services (sessions poolées du transport)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        latency, fault = self.server.faults.draw()
+        self.server.count("requests", fault or "ok")
+        if latency:
+            time.sleep(latency)
+
+        if fault == "timeout":
+            # Aucune réponse avant l'expiration du timeout de lecture du client, puis fermeture
+            time.sleep(self.server.faults.timeout_delay)
+            self.close_connection = True
+            return
+        if fault == "429":
+            retry_after = self.server.faults.retry_after
+            headers = {} if retry_after is None else {"Retry-After": f"{retry_after:g}"}
+            self._send(429, b'{"status_message": "Too Many Requests"}', headers)
+            return
+        if fault:
+            self._send(int(fault), b'{"error": true}')
+            return
+
+        status, body = self.server.upstream.route(url.path, parse_qs(url.query))
+        self._send(status, body)
+
+    def _send(self, status: int, body: bytes, headers: dict | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(
+    upstream: Upstream, faults: Faults, host: str = "127.0.0.1", ports: tuple[int, ...] = (ALLOCINE_PORT, TMDB_PORT)
+) -> list[FakeUpstreamServer]:
+    """Démarre un serveur par port dans des threads d'arrière-plan (port 0 = port libre choisi par le système)."""
+    servers = []
+    for port in ports:
+        server = FakeUpstreamServer((host, port), upstream, faults)
+        threading.Thread(target=server.serve_forever, name=f"fake-upstream-{port}", daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur Allociné/TMDB (fixtures et pannes injectées)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--allocine-port", type=int, default=ALLOCINE_PORT)
+    parser.add_argument("--tmdb-port", type=int, default=TMDB_PORT)
+    parser.add_argument("--pages", type=int, default=PAGES_PER_DAY, help="Pages de séances par (cinéma, date)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence fixe (secondes)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latence aléatoire ajoutée (secondes)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probabilité d'un 429 par requête")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Probabilité d'un 500/502/503 par requête")
+    parser.add_argument("--rate-timeout", type=float, default=0.0, help="Probabilité d'une requête sans réponse")
+    parser.add_argument("--timeout-delay", type=float, default=30.0, help="Durée d'une requête sans réponse")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After des 429 (négatif = absent)")
+    parser.add_argument("--seed", type=int, default=None, help="Graine des pannes (reproductibilité)")
+    parser.add_argument("--verbose", action="store_true", help="Journaliser chaque requête")
+    parser.add_argument("--print-theaters", type=int, metavar="N", help="Affiche un THEATERS de N cinémas et quitte")
+    args = parser.parse_args()
+
+    if args.print_theaters is not None:
+        print(json.dumps(theaters_config(args.print_theaters), ensure_ascii=False))
+        return
+
+    faults = Faults(
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        rate_timeout=args.rate_timeout,
+        timeout_delay=args.timeout_delay,
+        retry_after=args.retry_after if args.retry_after >= 0 else None,
+        seed=args.seed,
+    )
+    servers = serve(Upstream(args.pages), faults, args.host, (args.allocine_port, args.tmdb_port))
+    for server in servers:
+        server.verbose = args.verbose
+    allocine, tmdb = (f"http://{args.host}:{server.server_address[1]}" for server in servers)
+    print(f"🎭 Faux Allociné : {allocine}  (ALLOCINE_BASE_URL={allocine})")
+    print(f"🎭 Faux TMDB : {tmdb}/3  (TMDB_BASE_URL={tmdb}/3)")
+    print("   Ctrl+C (ou SIGTERM) pour arrêter et afficher les requêtes servies")
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.shutdown()
+        for name, server in zip(("Allociné", "TMDB"), servers):
+            print(f"📊 {name} : {dict(server.stats)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Benchmarks CinéLyon : analyse des pages Allociné, enrichissement TMDB, chargement des données et rendu.
+
+Hors ligne : les requêtes HTTP sont servies par `benchmarks/stub.py` à partir des fixtures, et des
+données synthétiques (1×, 10×, 100× les données actuelles de data/) sont générées dans un dossier
+temporaire. Les résultats sont comparés à `benchmarks/baseline.json`.
+
+    python benchmarks/run.py                  # mesure et signale les régressions
+    python benchmarks/run.py --save-baseline  # enregistre les résultats comme référence
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+from time import perf_counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+WORKDIR = tempfile.mkdtemp(prefix="cinelyon-bench-")
+
+# Avant tout import du projet : pas de limiteur, de cache HTTP, de thread de surveillance des données ni
+# d'écriture de l'instantané au chargement (le benchmark l'écrit lui-même), caches TMDB dans le dossier temporaire
+os.environ.update(
+    ALLOCINE_RATE_LIMIT="0",
+    TMDB_RATE_LIMIT="0",
+    HTTP_CACHE_DIR="",
+    TMDB_API_KEY="benchmark",
+    DATA_WATCH_INTERVAL="0",
+    WRITE_SNAPSHOT="0",
+)
+os.chdir(WORKDIR)
+sys.path.insert(0, ROOT)
+
+with redirect_stdout(io.StringIO()):
+    import app  # noqa: E402
+import scrape  # noqa: E402
+from benchmarks import stub  # noqa: E402
+from modules.Classes import ALLOCINE_HOST, TMDB_HOST, Movie, Theater, TmdbEnricher, clear_tmdb_cache, transport  # noqa: E402
+from modules.Geo import GeoIndex  # noqa: E402
+from modules.Storage import SNAPSHOT_FILE, manifest_sources, read_data, read_manifest, write_data, write_snapshot  # noqa: E402
+
+SCALES = (1, 10, 100)
+HOME_MAX_SCALE = 10  # Au-delà, le rendu (et la compression) de chaque page prend plusieurs secondes
+TOLERANCE = 0.5  # Écart toléré avant de signaler une régression (les mesures courtes sont bruitées)
+BENCH_THEATERS = 5
+SEARCH_QUERIES = ("avatar", "avtar feu", "james cameron", "science fiction", "ava")  # Mots, faute, préfixe
+GEO_THEATERS = (20, 500)  # Les cinémas de Lyon, puis ceux de toute la région
+
+
+def measure(func, repeat: int = 5) -> float:
+    """Meilleur temps de `repeat` exécutions, en secondes : le moins sensible à la charge de la machine."""
+    times = []
+    with redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            gc.collect()
+            gc.disable()  # Comme timeit : pas de collecte déclenchée au milieu d'une mesure
+            try:
+                start = perf_counter()
+                func()
+                times.append(perf_counter() - start)
+            finally:
+                gc.enable()
+    return min(times)
+
+
+def calibrate() -> float:
+    """Temps d'une charge Python fixe : ramène les ratios à la vitesse courante de la machine."""
+    return measure(lambda: sum(i * i for i in range(300_000)), 15)
+
+
+def make_theaters(count: int) -> list[Theater]:
+    data = {"location": None, "latitude": 45.75, "longitude": 4.85}
+    return [Theater({**data, "name": f"Cinéma {i}", "internalId": f"B{i:04d}"}) for i in range(count)]
+
+
+def bench_scraping(results: dict):
+    """Analyse des pages, construction des films, agrégation et enrichissement TMDB."""
+    date = datetime(2026, 10, 17)
+    theater = make_theaters(1)[0]
+    page = stub.load_fixture("allocine_showtimes.json")
+    movies = [result["movie"] for result in page["results"]]
+
+    results["parse.page"] = measure(lambda: theater._parseShowtimesPage(page), 50)
+    results["parse.getShowtimes.page"] = measure(lambda: list(theater.getShowtimes(date)), 20) / stub.PAGES_PER_DAY
+    results["movie.init"] = measure(lambda: [Movie(data) for data in movies], 50) / len(movies)
+
+    theaters = make_theaters(BENCH_THEATERS)
+    measure(lambda: scrape.get_showtimes(theaters, date), 1)  # Remplit le cache TMDB : seule l'agrégation est mesurée
+    results["scrape.get_showtimes"] = measure(lambda: scrape.get_showtimes(theaters, date), 10)
+
+    showtimes = list(theater.getShowtimes(date))
+    distinct = list({showtime.movie.id: showtime.movie for showtime in showtimes}.values())
+
+    def enrich_cold():
+        clear_tmdb_cache()
+        with TmdbEnricher() as enricher:
+            enricher.enrich(distinct)
+
+    results["tmdb.enrich.film"] = measure(enrich_cold, 10) / len(distinct)
+
+
+def scaled_days(days: list[dict], factor: int) -> list[dict]:
+    """Jours synthétiques à partir d'aujourd'hui : chaque film est dupliqué `factor` fois (titres distincts,
+    mêmes séances). Les dates sont décalées pour que l'application ne les écarte pas comme passées."""
+    return [
+        {
+            "date": (date.today() + timedelta(i)).isoformat(),
+            "movies": [
+                {**movie, "title": movie["title"] if k == 0 else f"{movie['title']} #{k + 1}"}
+                for k in range(factor)
+                for movie in day["movies"]
+            ],
+        }
+        for i, day in enumerate(days)
+    ]
+
+
+def bench_app(results: dict, scales: tuple[int, ...], home_max_scale: int):
+    """Chargement des données (instantané et JSON), recherche de films et latence de la page d'accueil par `delta`."""
+    base = read_data(os.path.join(ROOT, "data"))
+    client = app.app.test_client()
+    headers = {"Accept-Encoding": "br, gzip"}
+
+    for factor in scales:
+        data_dir = os.path.join(WORKDIR, f"data-{factor}x")
+        days = scaled_days(base["days"], factor)
+        write_data(days, base["generated_at"], data_dir)
+        write_snapshot(days, base["generated_at"], manifest_sources(read_manifest(data_dir)), data_dir)
+        app.DATA_PATH = data_dir
+        repeat = {1: 15, 10: 3}.get(factor, 1)
+
+        results[f"load.snapshot.{factor}x"] = measure(lambda: app.load_movies_data(force_reload=True), repeat)
+        snapshot = os.path.join(data_dir, SNAPSHOT_FILE)
+        os.rename(snapshot, f"{snapshot}.off")
+        results[f"load.json.{factor}x"] = measure(lambda: app.load_movies_data(force_reload=True), repeat)
+        os.rename(f"{snapshot}.off", snapshot)
+        with redirect_stdout(io.StringIO()):
+            data = app.load_movies_data(force_reload=True)
+        num_days = data["num_days"]
+        search = data["catalog"].search
+        results[f"search.{factor}x"] = measure(lambda: [search.search(q) for q in SEARCH_QUERIES], 20) / len(
+            SEARCH_QUERIES
+        )
+
+        if factor > home_max_scale:
+            continue
+        for delta in [None] + list(range(num_days)):
+            url = "/" if delta is None else f"/?delta={delta}"
+            name = "all" if delta is None else f"d{delta}"
+
+            def cold():
+                app._page_cache.clear()
+                client.get(url, headers=headers)
+
+            results[f"home.cold.{factor}x.{name}"] = measure(cold, 5 if factor == 1 else 2)
+            results[f"home.warm.{factor}x.{name}"] = measure(lambda: client.get(url, headers=headers), 50)
+
+    app.DATA_PATH = os.path.join(ROOT, "data")
+
+
+def bench_geo(results: dict):
+    """Recherche des cinémas dans un rayon de 5 km, sur des cinémas répartis autour de Lyon."""
+    rng = random.Random(0)
+    for count in GEO_THEATERS:
+        theaters = [
+            {"name": f"Cinéma {i}", "latitude": 45.75 + rng.uniform(-1, 1), "longitude": 4.85 + rng.uniform(-1.4, 1.4)}
+            for i in range(count)
+        ]
+        index = GeoIndex(theaters)
+        results[f"geo.nearby.{count}"] = measure(lambda: index.nearby(45.76, 4.83, 5), 100)
+
+
+def load_baseline() -> dict | None:
+    if not os.path.exists(BASELINE_FILE):
+        return None
+    with open(BASELINE_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def report(results: dict, calibration: float, baseline: dict | None, tolerance: float) -> list[str]:
+    """Affiche les résultats (ms) face à la référence ; retourne les mesures en régression.
+
+    Les ratios sont corrigés de l'écart de calibration entre la référence et la mesure courante."""
+    reference = (baseline or {}).get("results", {})
+    speed = calibration / baseline["calibration"] if baseline and baseline.get("calibration") else 1
+    print(f"🧮 Calibration : {calibration * 1000:.2f} ms ({speed:.2f}x la référence)")
+    regressions = []
+    print(f"{'mesure':<32} {'ms':>10} {'référence':>10} {'ratio':>7}")
+    for name, value in results.items():
+        line = f"{name:<32} {value * 1000:>10.3f}"
+        if name in reference:
+            ratio = value / (reference[name] * speed) if reference[name] else 1
+            status = ""
+            if ratio > 1 + tolerance:
+                status = " ⚠️ régression"
+                regressions.append(name)
+            line += f" {reference[name] * 1000:>10.3f} {ratio:>6.2f}x{status}"
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks CinéLyon (hors ligne)")
+    parser.add_argument("--scales", default=",".join(map(str, SCALES)), help="Facteurs des données synthétiques")
+    parser.add_argument("--home-max-scale", type=int, default=HOME_MAX_SCALE, help="Facteur maximal pour home()")
+    parser.add_argument("--runs", type=int, default=3, help="Passes complètes (médiane par mesure)")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Écart toléré (0.5 = +50%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistrer les résultats comme référence")
+    args = parser.parse_args()
+
+    stub.install(transport, (ALLOCINE_HOST, TMDB_HOST))
+    scales = tuple(int(scale) for scale in args.scales.split(","))
+    runs = []
+    calibrations = []
+    for run in range(1, args.runs + 1):
+        results = {}
+        calibrations.append(calibrate())
+        print(f"⏱️ Passe {run}/{args.runs} : scraping (analyse, films, agrégation, TMDB)...")
+        bench_scraping(results)
+        print(f"⏱️ Passe {run}/{args.runs} : application (chargement, page d'accueil)...")
+        bench_app(results, scales, args.home_max_scale)
+        bench_geo(results)
+        calibrations.append(calibrate())
+        runs.append(results)
+    # Médiane des passes : une passe ralentie par la machine ne fausse ni la référence ni la comparaison
+    results = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+    calibration = statistics.median(calibrations)
+
+    baseline = load_baseline()
+    if baseline and baseline.get("machine") != platform.node():
+        print(f"⚠️ Référence mesurée sur une autre machine ({baseline.get('machine')}), ratios indicatifs")
+    regressions = report(results, calibration, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "machine": platform.node(),
+                    "python": platform.python_version(),
+                    "calibration": calibration,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+            f.write("\n")
+        print(f"💾 Référence enregistrée dans {os.path.relpath(BASELINE_FILE, ROOT)}")
+        return 0
+
+    if regressions:
+        print(f"❌ {len(regressions)} régression(s) au-delà de +{args.tolerance:.0%}")
+        return 1
+    print("✅ Aucune régression")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(WORKDIR, ignore_errors=True)
@@ -0,0 +1,49 @@
+"""Stub HTTP hors ligne pour les benchmarks : un adaptateur `requests` qui sert les fixtures Allociné et TMDB.
+
+Monté sur les sessions du transport partagé (`install`), il remplace le réseau sans changer le code
+appelant : limiteur, retries et statistiques du transport restent dans la mesure. Les réponses sont
+celles du faux serveur (`benchmarks/fake_upstream.py`), sans socket ni pannes injectées.
+"""
+
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+
+from benchmarks.fake_upstream import PAGES_PER_DAY, Upstream, load_fixture
+
+__all__ = ["PAGES_PER_DAY", "StubAdapter", "install", "load_fixture"]
+
+
+class StubAdapter(BaseAdapter):
+    """Répond aux URLs Allociné (séances) et TMDB (recherche, détails) à partir des fixtures."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.requests = 0
+        self.upstream = Upstream(PAGES_PER_DAY)
+
+    def send(self, request, **kwargs) -> requests.Response:
+        self.requests += 1
+        url = urlparse(request.url)
+        status, body = self.upstream.route(url.path, parse_qs(url.query))
+        response = requests.Response()
+        response.status_code = status
+        response._content = body
+        response.headers["Content-Type"] = "application/json"
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def install(transport, hosts: tuple[str, ...]) -> StubAdapter:
+    """Monte le stub sur les sessions du transport pour les hôtes donnés."""
+    adapter = StubAdapter()
+    for host in hosts:
+        for prefix in ("http://", "https://"):
+            transport.session(host).mount(prefix, adapter)
+    return adapter
@@ -0,0 +1,330 @@
+"""Index en mémoire des films et séances chargés depuis data/, utilisés par l'API JSON.
+
+Construits une seule fois à chaque chargement des données : les requêtes ne font ensuite que des
+intersections de listes d'identifiants triées.
+"""
+
+import bisect
+from array import array
+from datetime import date
+
+from modules.Search import SearchIndex
+
+# Filtres portant sur une séance (jour, cinéma, langue, format) et sur un film (genre, réalisateur)
+SHOWTIME_FILTERS = ("day", "cinema", "lang", "format")
+FILM_FILTERS = ("genre", "director")
+TIMELINE_FILTERS = ("cinema", "lang", "format")  # Filtres ayant une frise horaire par jour
+_EMPTY_TIMELINE = (array("H"), array("I"))
+
+
+def time_to_minutes(value: str) -> int:
+    """Convertit "HH:MM" en minutes depuis minuit (ValueError si le format est invalide)."""
+    hours, minutes = value.split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"heure invalide: {value}")
+    return hours * 60 + minutes
+
+
+def split_formats(value: str | None) -> list[str]:
+    """Découpe un format Allociné ("IMAX, 3D") en jetons normalisés."""
+    return [token.strip().lower() for token in (value or "").split(",") if token.strip()]
+
+
+class Catalog:
+    """Films et séances normalisés, avec index inversés par jour, cinéma, genre, réalisateur, langue et format.
+
+    Les films sont numérotés par intérêt décroissant (wantToSee) et les séances par jour puis heure :
+    l'ordre des identifiants est l'ordre de réponse, ce qui permet une pagination par curseur.
+    """
+
+    def __init__(self, days: list[tuple[date, list[dict]]], version: str = "") -> None:
+        self.version = version
+        self.dates = [day for day, _ in days]
+        self.date_positions = {day: i for i, day in enumerate(self.dates)}
+        self.films: list[dict] = []
+        self.cinemas: list[str] = []
+        # Séances : (jour, minutes, film, cinéma, langue, format, url de réservation)
+        self.rows: list[tuple] = []
+        self.film_index: dict[str, dict[str, list[int]]] = {key: {} for key in SHOWTIME_FILTERS + FILM_FILTERS}
+        self.row_index: dict[str, dict] = {key: {} for key in SHOWTIME_FILTERS + ("film",)}
+        # Frises horaires : (jour, filtre, valeur) -> minutes de début triées et séances correspondantes ;
+        # le filtre "all" couvre toutes les séances du jour
+        self.timelines: dict[tuple, tuple[array, array]] = {}
+
+        films_by_title = {}
+        for _, movies in days:
+            for film in movies:
+                films_by_title.setdefault(film["title"], film)
+
+        for film in sorted(films_by_title.values(), key=lambda x: x["wantToSee"], reverse=True):
+            self.films.append(
+                {
+                    "id": len(self.films),
+                    "title": film["title"],
+                    "original_title": film.get("original_title"),
+                    "release_year": film["release_year"],
+                    "duree": film["duree"],
+                    "rating": film["rating"],
+                    "genres": [genre.strip() for genre in (film["genres"] or "").split(",") if genre.strip()],
+                    "director": film["director"],
+                    "synopsis": film["synopsis"],
+                    "affiche": film["affiche"],
+                    "url": film["url"],
+                    "wantToSee": film["wantToSee"],
+                }
+            )
+        film_ids = {film["title"]: film["id"] for film in self.films}
+
+        self.cinemas = sorted({cinema for _, movies in days for film in movies for cinema in film["seances"]})
+        cinema_ids = {name: i for i, name in enumerate(self.cinemas)}
+
+        rows = []
+        for day_index, (_, movies) in enumerate(days):
+            for film in movies:
+                for cinema, seances in film["seances"].items():
+                    for seance in seances:
+                        rows.append(
+                            (
+                                day_index,
+                                time_to_minutes(seance["time"]),
+                                film_ids[film["title"]],
+                                cinema_ids[cinema],
+                                seance["lang"],
+                                seance.get("format"),
+                                seance.get("ticketing_url"),
+                            )
+                        )
+        self.rows = sorted(rows, key=lambda row: row[:4])
+
+        # Index inversés : clé normalisée -> identifiants triés. Les séances d'un jour étant numérotées par
+        # heure, chaque frise horaire se remplit déjà dans l'ordre
+        film_sets = {key: {} for key in SHOWTIME_FILTERS}
+        for row_id, (day_index, minutes, film_id, cinema_id, lang, format_, _) in enumerate(self.rows):
+            keys = {
+                "day": [day_index],
+                "cinema": [self.cinemas[cinema_id].lower()],
+                "lang": [lang.upper()],
+                "format": split_formats(format_),
+            }
+            for field, values in keys.items():
+                for value in values:
+                    self.row_index[field].setdefault(value, []).append(row_id)
+                    film_sets[field].setdefault(value, set()).add(film_id)
+                    if field != "day":
+                        self._add_to_timeline((day_index, field, value), minutes, row_id)
+            self._add_to_timeline((day_index, "all", None), minutes, row_id)
+            self.row_index["film"].setdefault(film_id, []).append(row_id)
+
+        for field, index in film_sets.items():
+            self.film_index[field] = {value: sorted(ids) for value, ids in index.items()}
+        for film in self.films:
+            for genre in film["genres"]:
+                self.film_index["genre"].setdefault(genre.lower(), []).append(film["id"])
+            if film["director"] and film["director"] != "Inconnu":
+                self.film_index["director"].setdefault(film["director"].lower(), []).append(film["id"])
+        self.search = SearchIndex(self.films)
+
+    def _add_to_timeline(self, key: tuple, minutes: int, row_id: int) -> None:
+        timeline = self.timelines.get(key)
+        if timeline is None:
+            timeline = self.timelines[key] = (array("H"), array("I"))
+        timeline[0].append(minutes)
+        timeline[1].append(row_id)
+
+    def state(self) -> dict:
+        """Index précalculés, indépendants de la date du jour (pour l'instantané binaire de `modules.Storage`)."""
+        return {
+            "films": self.films,
+            "cinemas": self.cinemas,
+            "rows": self.rows,
+            "film_index": self.film_index,
+            "row_index": self.row_index,
+            "timelines": self.timelines,
+            "search": self.search.state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict, dates: list[date], version: str = "") -> "Catalog":
+        """Reconstruit un catalogue depuis `state()` sans recalculer les index."""
+        catalog = cls.__new__(cls)
+        catalog.version = version
+        catalog.dates = dates
+        catalog.date_positions = {day: i for i, day in enumerate(dates)}
+        for field, value in state.items():
+            setattr(catalog, field, value)
+        catalog.search = SearchIndex.from_state(state["search"])
+        return catalog
+
+    def day_index(self, value: str) -> int:
+        """Retourne l'indice d'un jour donné en date ISO ("2026-10-17") ou en décalage ("0", "1"...)."""
+        if value.lstrip("-").isdigit():
+            index = int(value)
+            if not 0 <= index < len(self.dates):
+                raise ValueError(f"jour hors période: {value}")
+            return index
+        try:
+            return self.date_positions[date.fromisoformat(value)]
+        except (KeyError, ValueError):
+            raise ValueError(f"jour inconnu: {value}") from None
+
+    def normalize_filters(self, filters: dict) -> dict:
+        """Normalise les valeurs de filtres (casse, jour en indice, format) ; les valeurs vides sont ignorées."""
+        normalized = {}
+        for field, value in filters.items():
+            if value in (None, ""):
+                continue
+            if field == "day":
+                normalized[field] = self.day_index(value)
+            elif field == "lang":
+                normalized[field] = value.upper()
+            else:
+                normalized[field] = value.strip().lower()
+        return normalized
+
+    def query_showtimes(
+        self,
+        filters: dict,
+        film: int | None = None,
+        start: int | None = None,
+        end: int | None = None,
+        after: int = -1,
+        limit: int | None = 50,
+    ) -> tuple[list[int], int | None]:
+        """Séances correspondant aux filtres (déjà normalisés) et à la fenêtre horaire [start, end].
+
+        Retourne les identifiants de la page et le curseur de la page suivante (None si dernière page)."""
+        first, last = 0, len(self.rows)
+        if "day" in filters:
+            # Séances triées par jour : celles d'un jour forment une plage contiguë d'identifiants
+            day_rows = self.row_index["day"].get(filters["day"], [])
+            first, last = (day_rows[0], day_rows[-1] + 1) if day_rows else (0, 0)
+        candidates = [
+            self.row_index[field].get(value, [])
+            for field, value in filters.items()
+            if field in SHOWTIME_FILTERS and field != "day"
+        ]
+        film_ids = self._film_filter(filters, film)
+
+        if candidates:
+            # Parcours de la liste la plus courte ; les autres sont des listes triées, sondées par dichotomie
+            candidates.sort(key=len)
+            base, others = candidates[0], candidates[1:]
+        elif film_ids is not None:
+            base, others = sorted(row for f in film_ids for row in self.row_index["film"].get(f, [])), []
+        else:
+            base, others = range(first, last), []
+        positions = [0] * len(others)
+
+        result = []
+        for i in range(bisect.bisect_left(base, max(after + 1, first)), len(base)):
+            row_id = base[i]
+            if row_id >= last:
+                break
+            if not self._contains_all(others, positions, row_id):
+                continue
+            row = self.rows[row_id]
+            if film_ids is not None and row[2] not in film_ids:
+                continue
+            if (start is not None and row[1] < start) or (end is not None and row[1] > end):
+                continue
+            result.append(row_id)
+            if limit is not None and len(result) > limit:
+                return result[:limit], result[limit - 1]
+        return result, None
+
+    @staticmethod
+    def _contains_all(lists: list[list[int]], positions: list[int], row_id: int) -> bool:
+        """Vrai si `row_id` est dans chacune des listes triées. Les identifiants testés étant croissants, chaque
+        recherche reprend à la position de la précédente (`positions`, mise à jour) : aucun ensemble n'est construit."""
+        for i, ids in enumerate(lists):
+            positions[i] = bisect.bisect_left(ids, row_id, positions[i])
+            if positions[i] == len(ids) or ids[positions[i]] != row_id:
+                return False
+        return True
+
+    def query_films(
+        self, filters: dict, start: int | None = None, end: int | None = None, after: int = -1, limit: int = 50
+    ) -> tuple[list[int], int | None]:
+        """Films ayant au moins une séance correspondant aux filtres, par intérêt décroissant."""
+        showtime_filters = {field: value for field, value in filters.items() if field in SHOWTIME_FILTERS}
+        film_ids = self._film_filter(filters)
+
+        if len(showtime_filters) > 1 or start is not None or end is not None:
+            # Plusieurs critères de séance doivent être vrais pour une même séance
+            rows, _ = self.query_showtimes(filters, start=start, end=end, limit=None)
+            matching = {self.rows[row_id][2] for row_id in rows}
+        elif showtime_filters:
+            field, value = next(iter(showtime_filters.items()))
+            matching = set(self.film_index[field].get(value, []))
+        else:
+            matching = set(range(len(self.films)))
+
+        if film_ids is not None:
+            matching &= film_ids
+
+        ids = sorted(film_id for film_id in matching if film_id > after)
+        if len(ids) > limit:
+            return ids[:limit], ids[limit - 1]
+        return ids, None
+
+    def starting_between(self, day: int, start: int, end: int, filters: dict) -> list[int]:
+        """Séances du jour `day` commençant entre `start` et `end` (minutes depuis minuit), par heure de début.
+
+        Recherche dichotomique dans la frise la plus courte parmi les filtres cinéma, langue et format (filtres
+        déjà normalisés), puis vérification des autres filtres sur les seules séances de la fenêtre."""
+        keys = [(field, filters[field]) for field in TIMELINE_FILTERS if field in filters] or [("all", None)]
+        minutes, row_ids = min(
+            (self.timelines.get((day, field, value), _EMPTY_TIMELINE) for field, value in keys),
+            key=lambda timeline: len(timeline[0]),
+        )
+        window = row_ids[bisect.bisect_left(minutes, start) : bisect.bisect_right(minutes, end)]
+
+        film_ids = self._film_filter(filters)
+        result = []
+        for row_id in window:
+            _, _, film_id, cinema_id, lang, format_, _ = self.rows[row_id]
+            if "cinema" in filters and self.cinemas[cinema_id].lower() != filters["cinema"]:
+                continue
+            if "lang" in filters and lang.upper() != filters["lang"]:
+                continue
+            if "format" in filters and filters["format"] not in split_formats(format_):
+                continue
+            if film_ids is not None and film_id not in film_ids:
+                continue
+            result.append(row_id)
+        return result
+
+    def _film_filter(self, filters: dict, film: int | None = None) -> set[int] | None:
+        sets = [set(self.film_index[field].get(value, [])) for field, value in filters.items() if field in FILM_FILTERS]
+        if film is not None:
+            sets.append({film})
+        return set.intersection(*sets) if sets else None
+
+    def film_json(self, film_id: int) -> dict:
+        return self.films[film_id]
+
+    def showtime_json(self, row_id: int) -> dict:
+        day_index, minutes, film_id, cinema_id, lang, format_, ticketing_url = self.rows[row_id]
+        return {
+            "film_id": film_id,
+            "title": self.films[film_id]["title"],
+            "date": self.dates[day_index].isoformat(),
+            "cinema": self.cinemas[cinema_id],
+            "time": f"{minutes // 60:02d}:{minutes % 60:02d}",
+            "lang": lang,
+            "format": format_,
+            "ticketing_url": ticketing_url,
+        }
+
+    def encode_cursor(self, last_id: int | None) -> str | None:
+        return None if last_id is None else f"{self.version}.{last_id}"
+
+    def decode_cursor(self, cursor: str | None) -> int:
+        """Retourne le dernier identifiant déjà servi (-1 sans curseur) ; ValueError si le curseur a expiré."""
+        if not cursor:
+            return -1
+        version, _, last_id = cursor.rpartition(".")
+        if version != self.version or not last_id.isdigit():
+            raise ValueError("curseur invalide ou expiré (données rechargées)")
+        return int(last_id)
@@ -1,13 +1,26 @@
+import hashlib
 import json
 import os
+import random
 import re
+import threading
 import time
 import unicodedata
+import weakref
+import zlib
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import nullcontext
 from dataclasses import dataclass
 from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Iterator
+from urllib.parse import urlparse
 
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from modules.Metrics import metrics
 
 
 @dataclass
@@ -24,48 +37,460 @@ load_dotenv()
 # Récupérer la clé API
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 
-# Cache TMDB pour éviter les appels API répétés
+# URLs de base des services, modifiables pour viser un serveur de test (benchmarks/fake_upstream.py)
+ALLOCINE_BASE_URL = os.getenv("ALLOCINE_BASE_URL", "https://www.allocine.fr").rstrip("/")
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3").rstrip("/")
+
+# Limites de débit par hôte (requêtes/seconde, rafale), 0 = illimité
+ALLOCINE_HOST = urlparse(ALLOCINE_BASE_URL).netloc
+TMDB_HOST = urlparse(TMDB_BASE_URL).netloc
+RATE_LIMITS = {
+    ALLOCINE_HOST: (float(os.getenv("ALLOCINE_RATE_LIMIT", "2")), int(os.getenv("ALLOCINE_BURST", "4"))),
+    TMDB_HOST: (float(os.getenv("TMDB_RATE_LIMIT", "20")), int(os.getenv("TMDB_BURST", "10"))),
+}
+TMDB_WORKERS = int(os.getenv("TMDB_WORKERS", "4"))
+
+# Transport HTTP : timeouts (connexion, lecture) en secondes et retries sur 429/5xx/erreurs réseau
+HTTP_TIMEOUT = (float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")), float(os.getenv("HTTP_READ_TIMEOUT", "20")))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF = 1.0  # Base du backoff exponentiel (secondes), avec jitter complet
+HTTP_MAX_WAIT = 60.0  # Attente maximale entre deux tentatives, Retry-After compris
+HTTP_POOL_SIZE = 16  # Connexions gardées ouvertes par hôte
+TMDB_MAX_CANDIDATES = 8  # Résultats de recherche départagés par réalisateur
+
+# Cache disque des pages Allociné (requêtes conditionnelles ETag/Last-Modified), vide = désactivé
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+HTTP_CACHE_MAX_AGE = 3 * 86400  # Entrées inutilisées depuis plus longtemps supprimées (dates passées)
+
+# Cache TMDB pour éviter les appels API répétés :
+# un instantané compacté (committé) + un journal JSONL en ajout seul, rejoué au chargement
 TMDB_CACHE_FILE = "tmdb_cache.json"
+TMDB_CACHE_LOG = "tmdb_cache.log.jsonl"
+TMDB_CACHE_FLUSH_EVERY = 25  # Nombre d'écritures regroupées avant un ajout au journal
+
+# Durées de validité des entrées du cache TMDB (secondes)
+TMDB_TTL = 30 * 86400  # Fiche trouvée (titre original, année, synopsis), à ±25% près pour étaler les rafraîchissements
+TMDB_RATING_TTL = 7 * 86400  # Note connue, rafraîchie indépendamment de la fiche
+TMDB_NEGATIVE_TTL = 6 * 3600  # Film introuvable ou note inconnue, doublée à chaque nouvel échec
+TMDB_NEGATIVE_MAX_TTL = 7 * 86400
 _tmdb_cache = {}
+_tmdb_cache_pending: list[str] = []
+_tmdb_cache_lock = threading.RLock()
+
+
+class RateLimiter:
+    """Limiteur de débit à seau de jetons, partageable entre threads."""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloque jusqu'à ce qu'un jeton soit disponible."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+_rate_limiters: dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(host: str) -> RateLimiter:
+    """Retourne le limiteur partagé d'un hôte (créé à la première demande)."""
+    with _rate_limiters_lock:
+        if host not in _rate_limiters:
+            rate, burst = RATE_LIMITS.get(host, (0, 1))
+            _rate_limiters[host] = RateLimiter(rate, burst)
+        return _rate_limiters[host]
+
+
+class HttpStats:
+    """Compteurs HTTP par hôte (requêtes, retries, octets, latence), partagés entre threads."""
+
+    FIELDS = ("requests", "retries", "errors", "throttled", "bytes", "latency_total", "latency_max")
+
+    def __init__(self) -> None:
+        self._hosts: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host: str) -> dict:
+        if host not in self._hosts:
+            self._hosts[host] = {field: 0 for field in self.FIELDS}
+        return self._hosts[host]
+
+    def record(self, host: str, status: int, size: int, latency: float) -> None:
+        with self._lock:
+            counters = self._host(host)
+            counters["requests"] += 1
+            counters["bytes"] += size
+            counters["latency_total"] += latency
+            counters["latency_max"] = max(counters["latency_max"], latency)
+            if status == 429:
+                counters["throttled"] += 1
+
+    def increment(self, host: str, field: str) -> None:
+        with self._lock:
+            self._host(host)[field] += 1
+
+    def snapshot(self) -> dict[str, dict]:
+        """Copie des compteurs, avec la latence moyenne par hôte."""
+        with self._lock:
+            result = {}
+            for host, counters in self._hosts.items():
+                result[host] = dict(counters)
+                requests_count = counters["requests"]
+                result[host]["latency_avg"] = counters["latency_total"] / requests_count if requests_count else 0
+            return result
+
+
+class Transport:
+    """Couche HTTP partagée par Allociné et TMDB.
+
+    Une session poolée par hôte (connexions keep-alive réutilisées), des timeouts systématiques,
+    le limiteur de débit de l'hôte avant chaque tentative, et des retries avec backoff exponentiel
+    à jitter complet sur erreurs réseau, 429 et 5xx, en respectant `Retry-After`.
+    """
+
+    def __init__(
+        self,
+        timeout: tuple[float, float] = HTTP_TIMEOUT,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff: float = HTTP_BACKOFF,
+        pool_size: int = HTTP_POOL_SIZE,
+    ) -> None:
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.stats = HttpStats()
+        self._sessions: dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def session(self, host: str) -> requests.Session:
+        """Retourne la session de l'hôte (créée à la première demande)."""
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+            return self._sessions[host]
+
+    def get(
+        self,
+        url: str,
+        params: dict | None = None,
+        timeout=None,
+        headers: dict | None = None,
+        stage: str | None = None,
+        labels: dict | None = None,
+    ) -> requests.Response:
+        """GET avec retries ; la dernière réponse (ou exception réseau) est renvoyée à l'appelant.
+
+        Avec `stage`, chaque appel réseau est mesuré sous ce nom avec `labels` (cinéma, date, page...), sans
+        l'attente du limiteur ni celle des retries, qui dépendent de l'ordonnancement et non de la cible."""
+        host = urlparse(url).netloc
+        session = self.session(host)
+        limiter = get_rate_limiter(host)
+
+        for attempt in range(self.max_retries + 1):
+            with metrics.timer("http.wait"):
+                limiter.acquire()
+            start = time.monotonic()
+            try:
+                with metrics.timer(stage, **(labels or {})) if stage else nullcontext():
+                    response = session.get(url, params=params, timeout=timeout or self.timeout, headers=headers)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.stats.increment(host, "errors")
+                if attempt == self.max_retries:
+                    raise
+                self.stats.increment(host, "retries")
+                time.sleep(self._backoff(attempt))
+                continue
 
+            self.stats.record(host, response.status_code, len(response.content), time.monotonic() - start)
+            if (response.status_code == 429 or response.status_code >= 500) and attempt < self.max_retries:
+                wait_time = self._retry_after(response)
+                if wait_time is None:
+                    wait_time = self._backoff(attempt)
+                print(f"   ⏳ {host}: HTTP {response.status_code}, nouvelle tentative dans {wait_time:.1f}s")
+                self.stats.increment(host, "retries")
+                time.sleep(wait_time)
+                continue
+            return response
 
-def load_tmdb_cache():
-    """Charge le cache TMDB depuis le fichier."""
-    global _tmdb_cache
-    if os.path.exists(TMDB_CACHE_FILE):
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(HTTP_MAX_WAIT, self.backoff * 2**attempt))
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> float | None:
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
         try:
-            with open(TMDB_CACHE_FILE, "r", encoding="utf-8") as f:
-                _tmdb_cache = json.load(f)
-        except (json.JSONDecodeError, IOError):
-            _tmdb_cache = {}
+            wait_time = float(value)
+        except ValueError:
+            try:
+                wait_time = (parsedate_to_datetime(value) - datetime.now().astimezone()).total_seconds()
+            except (TypeError, ValueError):
+                return None
+        return min(max(wait_time, 0), HTTP_MAX_WAIT)
 
 
-def save_tmdb_cache():
-    """Sauvegarde le cache TMDB dans un fichier."""
-    with open(TMDB_CACHE_FILE, "w", encoding="utf-8") as f:
-        json.dump(_tmdb_cache, f, ensure_ascii=False, indent=2)
+transport = Transport()
 
 
-def tmdb_request(url: str, params: dict, max_retries: int = 3) -> dict:
-    """Effectue une requête TMDB avec retry et exponential backoff."""
-    for attempt in range(max_retries):
+@dataclass
+class CachedPage:
+    url: str
+    status: int
+    body: bytes
+    unchanged: bool  # Contenu identique à la dernière version stockée (304 ou même empreinte)
+    info: dict  # Données associées par l'appelant lors du stockage (ex. nombre de pages)
+    validators: dict  # ETag et Last-Modified de la réponse
+
+
+class HttpCache:
+    """Cache disque des réponses GET : corps, ETag, Last-Modified et empreinte sha256, un fichier par URL.
+
+    Les requêtes sont conditionnelles (If-None-Match / If-Modified-Since) : un 304 évite le
+    téléchargement, et une réponse 200 de même empreinte est aussi signalée comme inchangée. Une page
+    n'est stockée (`store`) qu'une fois analysée avec succès, avec les informations utiles à l'appelant
+    pour ne plus l'analyser tant qu'elle ne change pas.
+    """
+
+    FIELDS = ("requests", "not_modified", "unchanged", "changed", "new", "bytes_saved", "parse_skipped")
+
+    def __init__(self, directory: str = HTTP_CACHE_DIR, transport: Transport = transport) -> None:
+        self.directory = directory
+        self.transport = transport
+        self.stats = {field: 0 for field in self.FIELDS}
+        self._lock = threading.Lock()
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _load(self, url: str) -> dict | None:
+        if not self.directory:
+            return None
         try:
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 429:  # Rate limit
-                wait_time = 2**attempt
-                print(f"   ⏳ Rate limit TMDB, attente {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                print(f"   ⚠️ TMDB erreur {response.status_code}")
-                return {}
-        except requests.exceptions.Timeout:
-            print(f"   ⏳ Timeout TMDB (tentative {attempt + 1}/{max_retries})")
-            time.sleep(1)
-        except requests.exceptions.RequestException as e:
-            print(f"   ❌ Erreur réseau TMDB: {e}")
-            return {}
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def increment(self, field: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[field] += value
+
+    def fetch(self, url: str, stage: str | None = None, labels: dict | None = None) -> CachedPage:
+        """GET conditionnel ; un 304 renvoie le corps stocké, marqué inchangé (`stage` et `labels` : voir
+        `Transport.get`)."""
+        entry = self._load(url)
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self.transport.get(url, headers=headers or None, stage=stage, labels=labels)
+        self.increment("requests")
+
+        if response.status_code == 304 and entry is not None:
+            body = entry["body"].encode("utf-8")
+            self.increment("not_modified")
+            self.increment("bytes_saved", len(body))
+            os.utime(self._path(url))
+            # Validateurs de l'entrée repris : un `store` ultérieur ne doit pas les effacer
+            validators = {"etag": entry.get("etag"), "last_modified": entry.get("last_modified")}
+            return CachedPage(url, 200, body, True, entry["info"], validators)
+
+        body = response.content
+        validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        unchanged = (
+            response.status_code == 200 and entry is not None and entry["sha256"] == hashlib.sha256(body).hexdigest()
+        )
+        if response.status_code == 200:
+            self.increment("unchanged" if unchanged else "changed" if entry is not None else "new")
+
+        page = CachedPage(url, response.status_code, body, unchanged, entry["info"] if unchanged else {}, validators)
+        if unchanged:
+            self.store(page, page.info)  # Validateurs éventuellement renouvelés
+        return page
+
+    def store(self, page: CachedPage, info: dict) -> None:
+        """Stocke une page analysée avec succès, avec les informations de l'appelant."""
+        if not self.directory or page.status != 200:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {
+            "url": page.url,
+            "etag": page.validators.get("etag"),
+            "last_modified": page.validators.get("last_modified"),
+            "sha256": hashlib.sha256(page.body).hexdigest(),
+            "stored_at": datetime.now().isoformat(),
+            "info": info,
+            "body": page.body.decode("utf-8"),
+        }
+        atomic_write_json(self._path(page.url), entry, indent=None)
+
+    def prune(self, max_age: float = HTTP_CACHE_MAX_AGE) -> int:
+        """Supprime les entrées inutilisées depuis `max_age` secondes ; retourne leur nombre."""
+        if not self.directory or not os.path.isdir(self.directory):
+            return 0
+        removed = 0
+        limit = time.time() - max_age
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+                removed += 1
+        return removed
+
+    def report(self) -> dict:
+        """Compteurs de la session, avec le taux de pages inchangées (304 ou même empreinte)."""
+        with self._lock:
+            stats = dict(self.stats)
+        hits = stats["not_modified"] + stats["unchanged"]
+        stats["hit_rate"] = hits / stats["requests"] if stats["requests"] else 0
+        return stats
+
+
+http_cache = HttpCache()
+
+
+def load_tmdb_cache():
+    """Charge le cache TMDB depuis l'instantané puis rejoue le journal d'écritures."""
+    global _tmdb_cache
+    with _tmdb_cache_lock:
+        _tmdb_cache = {}
+        _tmdb_cache_pending.clear()
+        if os.path.exists(TMDB_CACHE_FILE):
+            try:
+                with open(TMDB_CACHE_FILE, "r", encoding="utf-8") as f:
+                    _tmdb_cache = json.load(f)
+            except (json.JSONDecodeError, IOError) as e:
+                print(f"⚠️ Cache TMDB illisible ({e}), seul le journal sera rejoué")
+
+        if os.path.exists(TMDB_CACHE_LOG):
+            torn = 0
+            with open(TMDB_CACHE_LOG, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Ligne tronquée par un arrêt brutal ; les lignes suivantes viennent d'exécutions ultérieures
+                        torn += 1
+                        continue
+                    if entry["value"] is None:
+                        _tmdb_cache.pop(entry["key"], None)
+                    else:
+                        _tmdb_cache[entry["key"]] = entry["value"]
+            if torn:
+                # Compacter tout de suite : sinon les prochains ajouts suivraient la ligne tronquée
+                print(f"⚠️ Journal du cache TMDB : {torn} ligne(s) tronquée(s) ignorée(s), cache compacté")
+                save_tmdb_cache()
+
+
+def get_tmdb_cache(key: str) -> dict | None:
+    """Retourne l'entrée de cache TMDB d'une clé, ou None."""
+    with _tmdb_cache_lock:
+        return _tmdb_cache.get(key)
+
+
+def set_tmdb_cache(key: str, value: dict | None):
+    """Enregistre (ou supprime si `value` vaut None) une entrée ; l'écriture disque est regroupée."""
+    with _tmdb_cache_lock:
+        if value is None:
+            _tmdb_cache.pop(key, None)
+        else:
+            _tmdb_cache[key] = value
+        _tmdb_cache_pending.append(json.dumps({"key": key, "value": value}, ensure_ascii=False))
+        if len(_tmdb_cache_pending) >= TMDB_CACHE_FLUSH_EVERY:
+            flush_tmdb_cache()
+
+
+def flush_tmdb_cache():
+    """Ajoute les écritures en attente au journal (un seul append + fsync par lot)."""
+    with _tmdb_cache_lock:
+        if not _tmdb_cache_pending:
+            return
+        with open(TMDB_CACHE_LOG, "a", encoding="utf-8") as f:
+            f.write("\n".join(_tmdb_cache_pending) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        _tmdb_cache_pending.clear()
+
+
+def save_tmdb_cache():
+    """Compacte le cache : réécrit l'instantané de façon atomique puis vide le journal."""
+    with _tmdb_cache_lock:
+        atomic_write_json(TMDB_CACHE_FILE, _tmdb_cache)
+        _tmdb_cache_pending.clear()
+        if os.path.exists(TMDB_CACHE_LOG):
+            os.remove(TMDB_CACHE_LOG)
+
+
+def close_tmdb_cache():
+    """Compacte le cache en fin d'exécution si des écritures ont eu lieu."""
+    with _tmdb_cache_lock:
+        if _tmdb_cache_pending or os.path.exists(TMDB_CACHE_LOG):
+            save_tmdb_cache()
+
+
+def clear_tmdb_cache():
+    """Vide le cache TMDB en mémoire et sur disque."""
+    with _tmdb_cache_lock:
+        _tmdb_cache.clear()
+        _tmdb_cache_pending.clear()
+        for path in (TMDB_CACHE_FILE, TMDB_CACHE_LOG):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def atomic_write_json(path: str, data, indent: int | None = 2):
+    """Écrit un fichier JSON via un fichier temporaire renommé : jamais de fichier à moitié écrit."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def tmdb_request(url: str, params: dict) -> dict:
+    """Effectue une requête TMDB via le transport partagé (retries et backoff inclus)."""
+    try:
+        response = transport.get(url, params=params)
+        if response.status_code == 200:
+            return response.json()
+        print(f"   ⚠️ TMDB erreur {response.status_code}")
+    except requests.exceptions.Timeout:
+        print("   ⏳ Timeout TMDB")
+    except requests.exceptions.RequestException as e:
+        print(f"   ❌ Erreur réseau TMDB: {e}")
     return {}
 
 
@@ -73,21 +498,113 @@ def tmdb_request(url: str, params: dict, max_retries: int = 3) -> dict:
 load_tmdb_cache()
 
 
+def default_tmdb_data(title: str) -> dict:
+    """Données TMDB utilisées tant qu'un film n'est pas (ou ne peut pas être) enrichi."""
+    return {
+        "year": "inconnue",
+        "rating": "Note inconnue",
+        "synopsis": "Synopsis non disponible",
+        "original_title": title,
+        "tmdb_id": None,
+    }
+
+
+def is_negative_tmdb_data(tmdb_data: dict) -> bool:
+    """Indique si une entrée TMDB correspond à un film introuvable (ou sans synopsis)."""
+    return tmdb_data.get("synopsis") in (None, "", "Synopsis non disponible")
+
+
+def _tmdb_backoff(misses: int) -> int:
+    return min(TMDB_NEGATIVE_TTL * 2 ** max(misses - 1, 0), TMDB_NEGATIVE_MAX_TTL)
+
+
+def stamp_tmdb_entry(key: str, tmdb_data: dict, previous: dict | None = None, now: int | None = None) -> dict:
+    """Date une entrée du cache TMDB et calcule ses expirations (fiche et note).
+
+    Un échec succède à une fiche valide : l'ancienne fiche est conservée, seule la prochaine
+    tentative est repoussée. Les échecs consécutifs allongent l'attente de façon exponentielle.
+    """
+    now = int(now or time.time())
+    previous = previous or {}
+
+    if is_negative_tmdb_data(tmdb_data):
+        entry = dict(previous) if previous and not is_negative_tmdb_data(previous) else dict(tmdb_data)
+        entry["misses"] = previous.get("misses", 0) + 1
+        entry["expires_at"] = now + _tmdb_backoff(entry["misses"])
+    else:
+        entry = dict(tmdb_data)
+        entry["misses"] = 0
+        jitter = 0.75 + (zlib.crc32(key.encode("utf-8")) % 500) / 1000
+        entry["expires_at"] = now + int(TMDB_TTL * jitter)
+    entry["fetched_at"] = now
+
+    return stamp_tmdb_rating(entry, previous, now)
+
+
+def stamp_tmdb_rating(entry: dict, previous: dict | None = None, now: int | None = None) -> dict:
+    """Calcule l'expiration de la note : longue si elle est connue, courte avec backoff sinon."""
+    now = int(now or time.time())
+    if entry["rating"] == "Note inconnue":
+        entry["rating_misses"] = (previous or {}).get("rating_misses", 0) + 1
+        entry["rating_expires_at"] = now + _tmdb_backoff(entry["rating_misses"])
+    else:
+        entry["rating_misses"] = 0
+        entry["rating_expires_at"] = now + TMDB_RATING_TTL
+    return entry
+
+
+def tmdb_cache_status(entry: dict | None, now: int | None = None) -> str:
+    """Retourne l'action à mener pour une entrée : "fresh", "legacy" (à dater), "rating" (note seule) ou "expired"."""
+    now = int(now or time.time())
+    if entry is None:
+        return "expired"
+    if "expires_at" not in entry:
+        # Entrée antérieure aux expirations : les échecs sont retentés, les fiches datées à la première lecture
+        return "expired" if is_negative_tmdb_data(entry) else "legacy"
+    if now >= entry["expires_at"]:
+        return "expired"
+    if now >= entry.get("rating_expires_at", 0):
+        return "rating" if entry.get("tmdb_id") else "expired"
+    return "fresh"
+
+
+def format_tmdb_rating(vote_average) -> str:
+    """Formate la note moyenne TMDB ("7.4"), ou "Note inconnue"."""
+    return str(round(vote_average, 1)) if vote_average else "Note inconnue"
+
+
 class Movie:
+    """Film Allociné réduit aux champs sérialisés, partagé par toutes ses séances."""
+
+    __slots__ = (
+        "title",
+        "id",
+        "runtime",
+        "allocine_year",
+        "release_year",
+        "rating",
+        "synopsis",
+        "original_title",
+        "letterboxd_url",
+        "genres",
+        "wantToSee",
+        "affiche",
+        "director",
+        "__weakref__",
+    )
+
+    # Films déjà construits, par internalId : un film vu dans 15 cinémas reste un seul objet
+    _instances: "weakref.WeakValueDictionary[int, Movie]" = weakref.WeakValueDictionary()
+    _instances_lock = threading.Lock()
+
     def __init__(self, data) -> None:
-        self.data = data
         self.title = data["title"]
         self.id = data["internalId"]
         self.runtime = data["runtime"]
         # Récupérer l'année originale d'Allocine si disponible
         self.allocine_year = data.get("releaseDate", {}).get("date", "").split("-")[0]
-        # Récupérer les données TMDB
-        tmdb_data = self._get_data_from_tmdb()
-        self.release_year = tmdb_data["year"]
-        self.rating = tmdb_data["rating"]
-        self.synopsis = tmdb_data["synopsis"]  # Utiliser le synopsis de TMDB
-        self.original_title = tmdb_data["original_title"]  # Titre original anglais
-        self.letterboxd_url = self._generate_letterboxd_url()
+        # Données TMDB par défaut, complétées ensuite par l'étape d'enrichissement (TmdbEnricher)
+        self.apply_tmdb(default_tmdb_data(self.title))
         self.genres = [genre["translate"] for genre in data["genres"]]
         self.wantToSee = data["stats"]["wantToSeeCount"]
         try:
@@ -99,133 +616,269 @@ class Movie:
         if len(data["credits"]) == 0:
             self.director = "Inconnu"
         else:
-            if data["credits"][0]["person"]["lastName"] is None:
-                data["credits"][0]["person"]["lastName"] = ""
-
-            if data["credits"][0]["person"]["firstName"] is None:
-                data["credits"][0]["person"]["firstName"] = ""
-
-            self.director = f"{data['credits'][0]['person']['firstName']} {data['credits'][0]['person']['lastName']}"
-            self.director = self.director.lstrip()
+            person = data["credits"][0]["person"]
+            self.director = f"{person['firstName'] or ''} {person['lastName'] or ''}".lstrip()
+
+    @classmethod
+    def intern(cls, data) -> "Movie":
+        """Retourne le film déjà construit pour cet internalId, ou le construit."""
+        with cls._instances_lock:
+            movie = cls._instances.get(data["internalId"])
+            if movie is None:
+                movie = cls(data)
+                cls._instances[movie.id] = movie
+            return movie
 
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} name={self.title}>"
 
+    @property
+    def tmdb_key(self) -> str:
+        """Clé de cache TMDB basée sur le titre et l'année Allocine."""
+        return f"{self.title}|{self.allocine_year or ''}"
+
+    def apply_tmdb(self, tmdb_data: dict) -> None:
+        """Applique les données TMDB (année, note, synopsis, titre original) au film."""
+        self.release_year = tmdb_data["year"]
+        self.rating = tmdb_data["rating"]
+        self.synopsis = tmdb_data["synopsis"]  # Utiliser le synopsis de TMDB
+        self.original_title = tmdb_data["original_title"]  # Titre original anglais
+        self.letterboxd_url = self._generate_letterboxd_url()
+
     def _slugify(self, text):
         """Convertit un titre en slug pour Letterboxd."""
-        # Normaliser les accents (é -> e, etc.)
-        text = unicodedata.normalize("NFD", text)
-        text = text.encode("ascii", "ignore").decode("utf-8")
-        # Convertir en minuscules
-        text = text.lower()
-        # Remplacer les espaces et caractères spéciaux par des tirets
-        text = re.sub(r"[^a-z0-9]+", "-", text)
-        # Supprimer les tirets en début et fin
-        text = text.strip("-")
-        return text
+        return slugify(text)
 
     def _generate_letterboxd_url(self):
         """Génère l'URL Letterboxd (Universal Link: ouvre l'app sur mobile si installée)."""
-        from urllib.parse import quote
-
-        search_query = f"{self.original_title} {self.release_year}"
-        return f"https://letterboxd.com/search/{quote(search_query)}/"
-
-    def _get_data_from_tmdb(self):
-        """Récupère l'année de sortie, la note et le synopsis du film depuis TMDB (avec cache et retry)."""
-        global _tmdb_cache
-
-        # Clé de cache basée sur le titre et l'année Allocine
-        cache_key = f"{self.title}|{self.allocine_year or ''}"
-
-        # Vérifier si les données sont en cache
-        if cache_key in _tmdb_cache:
-            return _tmdb_cache[cache_key]
-
-        default_data = {
-            "year": "inconnue",
-            "rating": "Note inconnue",
-            "synopsis": "Synopsis non disponible",
-            "original_title": self.title,
+        return letterboxd_url(self.original_title, self.release_year)
+
+
+def slugify(text: str) -> str:
+    """Convertit un texte en slug ASCII minuscule (accents retirés, séparateurs en tirets)."""
+    # Normaliser les accents (é -> e, etc.)
+    text = unicodedata.normalize("NFD", text)
+    text = text.encode("ascii", "ignore").decode("utf-8")
+    # Convertir en minuscules
+    text = text.lower()
+    # Remplacer les espaces et caractères spéciaux par des tirets
+    text = re.sub(r"[^a-z0-9]+", "-", text)
+    # Supprimer les tirets en début et fin
+    text = text.strip("-")
+    return text
+
+
+def letterboxd_url(original_title: str, release_year: str) -> str:
+    """URL de recherche Letterboxd d'un film à partir de son titre original et de son année."""
+    from urllib.parse import quote
+
+    search_query = f"{original_title} {release_year}"
+    return f"https://letterboxd.com/search/{quote(search_query)}/"
+
+
+# Détails TMDB (avec générique) par identifiant, partagés entre titres le temps d'une exécution
+_tmdb_details: dict[int, Future] = {}
+_tmdb_details_lock = threading.Lock()
+_tmdb_details_executor = ThreadPoolExecutor(max_workers=TMDB_WORKERS, thread_name_prefix="tmdb-details")
+
+
+def get_tmdb_details(movie_id: int) -> Future:
+    """Planifie (une seule fois par identifiant) la récupération des détails et du générique d'un film."""
+    with _tmdb_details_lock:
+        future = _tmdb_details.get(movie_id)
+        if future is None:
+            details_url = f"{TMDB_BASE_URL}/movie/{movie_id}"
+            details_params = {"api_key": TMDB_API_KEY, "language": "fr-FR", "append_to_response": "credits"}
+            future = _tmdb_details_executor.submit(tmdb_request, details_url, details_params)
+            _tmdb_details[movie_id] = future
+        return future
+
+
+def _tmdb_directors(details_data: dict) -> list[str]:
+    crew = details_data.get("credits", {}).get("crew", [])
+    return [slugify(c.get("name", "")) for c in crew if c.get("job") == "Director"]
+
+
+def score_tmdb_candidate(
+    candidate: dict, rank: int, title: str, allocine_year: str, director: str, details_data: dict | None
+) -> tuple:
+    """Score d'un résultat de recherche TMDB (comparé en tuple, du critère le plus fort au plus faible).
+
+    Réalisateur, puis année Allociné, puis titre exact (français ou original), puis popularité ;
+    le rang TMDB et la date de sortie la plus récente départagent les derniers ex aequo.
+    """
+    director_slug = slugify(director) if director and director != "Inconnu" else ""
+    director_match = bool(
+        director_slug
+        and details_data
+        and any(d and (director_slug in d or d in director_slug) for d in _tmdb_directors(details_data))
+    )
+    release_date = candidate.get("release_date") or ""
+    year_match = bool(allocine_year) and release_date.startswith(allocine_year)
+    title_slug = slugify(title)
+    title_match = title_slug in (slugify(candidate.get("title", "")), slugify(candidate.get("original_title", "")))
+
+    return (director_match, year_match, title_match, candidate.get("popularity", 0), -rank, release_date)
+
+
+def fetch_tmdb_data(title: str, allocine_year: str, director: str) -> dict:
+    """Récupère l'année de sortie, la note et le synopsis d'un film depuis TMDB (sans cache).
+
+    Les candidats ambigus sont départagés en une passe : leurs détails (générique inclus via
+    `append_to_response`) sont récupérés en parallèle et réutilisés pour le film retenu.
+    """
+    default_data = default_tmdb_data(title)
+
+    try:
+        search_url = f"{TMDB_BASE_URL}/search/movie"
+        params = {
+            "api_key": TMDB_API_KEY,
+            "query": title,
+            "language": "fr-FR",
         }
 
-        try:
-            search_url = "https://api.themoviedb.org/3/search/movie"
-            params = {
-                "api_key": TMDB_API_KEY,
-                "query": self.title,
-                "language": "fr-FR",
+        if allocine_year:
+            params["year"] = allocine_year
+
+        search_data = tmdb_request(search_url, params)
+        candidates = search_data.get("results", [])[:TMDB_MAX_CANDIDATES]
+
+        if candidates:
+            # Le générique n'est utile que si le réalisateur est connu et que l'année ne suffit pas à trancher
+            year_matches = [
+                c for c in candidates if allocine_year and (c.get("release_date") or "").startswith(allocine_year)
+            ]
+            details = {}
+            if director and director != "Inconnu" and len(candidates) > 1 and len(year_matches) != 1:
+                futures = {c["id"]: get_tmdb_details(c["id"]) for c in candidates}
+                details = {movie_id: future.result() for movie_id, future in futures.items()}
+
+            scores = [
+                score_tmdb_candidate(candidate, rank, title, allocine_year, director, details.get(candidate["id"]))
+                for rank, candidate in enumerate(candidates)
+            ]
+            movie = candidates[scores.index(max(scores))]
+
+            movie_id = movie["id"]
+            details_data = get_tmdb_details(movie_id).result()
+
+            result = {
+                "year": movie.get("release_date", "").split("-")[0] or "inconnue",
+                "rating": format_tmdb_rating(movie.get("vote_average")),
+                "synopsis": details_data.get("overview", "Synopsis non disponible"),
+                "original_title": movie.get("original_title", title),
+                "tmdb_id": movie_id,
             }
 
-            if self.allocine_year:
-                params["year"] = self.allocine_year
+            return result
+
+    except Exception as e:
+        print(f"❌ Erreur TMDB pour '{title}': {e}")
+
+    return default_data
+
+
+class TmdbEnricher:
+    """Étape d'enrichissement TMDB découplée du scraping des séances.
+
+    Chaque clé (titre, année Allociné) est résolue au plus une fois par exécution : les clés
+    absentes ou expirées du cache sont résolues en parallèle (recherche puis détails), sous le
+    limiteur de débit partagé de TMDB. Une note expirée est rafraîchie seule, sans toucher au
+    titre original ni à l'année. `submit` lance la résolution dès qu'un film est vu, `enrich`
+    attend les résultats et les applique aux films.
+    """
+
+    def __init__(self, max_workers: int = TMDB_WORKERS) -> None:
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tmdb")
+        self._futures: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "TmdbEnricher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def submit(self, movie: Movie) -> Future:
+        """Planifie la résolution TMDB d'un film (sans effet si sa clé est déjà connue)."""
+        return self.submit_key(movie.tmdb_key, movie.title, movie.allocine_year, movie.director)
+
+    def submit_key(self, key: str, title: str, allocine_year: str, director: str) -> Future:
+        """Planifie la résolution TMDB d'une clé de cache selon l'état de son entrée."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                entry = get_tmdb_cache(key)
+                status = tmdb_cache_status(entry)
+                if status == "legacy":
+                    entry = stamp_tmdb_entry(key, entry)
+                    set_tmdb_cache(key, entry)
+                    status = "fresh"
+
+                metrics.increment(f"tmdb.cache.{status}")
+                if status == "fresh":
+                    if is_negative_tmdb_data(entry):
+                        metrics.increment("tmdb.cache.negative")
+                    future = Future()
+                    future.set_result(entry)
+                elif status == "rating":
+                    future = self._executor.submit(self._refresh_rating, key, entry)
+                else:
+                    future = self._executor.submit(self._resolve, key, title, allocine_year, director, entry)
+                self._futures[key] = future
+            return future
 
-            search_data = tmdb_request(search_url, params)
+    def result(self, key: str) -> dict:
+        """Attend et retourne les données TMDB d'une clé déjà planifiée."""
+        return self._futures[key].result()
 
-            movie = None
-            results = search_data.get("results", [])
+    def enrich(self, movies) -> None:
+        """Attend les données TMDB des films donnés et les leur applique."""
+        movies = list(movies)
+        for movie in movies:
+            self.submit(movie)
+        for movie in movies:
+            movie.apply_tmdb(self.result(movie.tmdb_key))
 
-            if results:
-                if self.allocine_year:
-                    matching_results = [r for r in results if r.get("release_date", "").startswith(self.allocine_year)]
-                    movie = matching_results[0] if matching_results else results[0]
-                else:
-                    if hasattr(self, "director") and self.director and self.director != "Inconnu":
-                        for result in results:
-                            movie_id = result.get("id")
-                            credits_url = f"https://api.themoviedb.org/3/movie/{movie_id}/credits"
-                            credits_params = {"api_key": TMDB_API_KEY}
-                            credits_data = tmdb_request(credits_url, credits_params)
-                            crew = credits_data.get("crew", [])
-                            directors = [c.get("name", "").lower() for c in crew if c.get("job") == "Director"]
-                            if any(self.director.lower() in d or d in self.director.lower() for d in directors):
-                                movie = result
-                                break
-
-                    if not movie:
-                        sorted_results = sorted(
-                            [r for r in results if r.get("release_date")],
-                            key=lambda x: x.get("release_date", ""),
-                            reverse=True,
-                        )
-                        movie = sorted_results[0] if sorted_results else results[0]
-
-            if movie:
-                movie_id = movie["id"]
-                details_url = f"https://api.themoviedb.org/3/movie/{movie_id}"
-                details_params = {"api_key": TMDB_API_KEY, "language": "fr-FR"}
-                details_data = tmdb_request(details_url, details_params)
-
-                result = {
-                    "year": movie.get("release_date", "").split("-")[0] or "inconnue",
-                    "rating": str(round(movie.get("vote_average", 0), 1))
-                    if movie.get("vote_average")
-                    else "Note inconnue",
-                    "synopsis": details_data.get("overview", "Synopsis non disponible"),
-                    "original_title": movie.get("original_title", self.title),
-                }
-
-                # Sauvegarder dans le cache
-                _tmdb_cache[cache_key] = result
-                save_tmdb_cache()
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
 
-                return result
+    @staticmethod
+    def _resolve(key: str, title: str, allocine_year: str, director: str, previous: dict | None) -> dict:
+        # Les échecs sont aussi mis en cache, avec une expiration courte
+        with metrics.timer("tmdb.resolve"):
+            tmdb_data = fetch_tmdb_data(title, allocine_year, director)
+        if is_negative_tmdb_data(tmdb_data):
+            metrics.increment("tmdb.not_found")
+        entry = stamp_tmdb_entry(key, tmdb_data, previous)
+        set_tmdb_cache(key, entry)
+        return entry
 
-        except Exception as e:
-            print(f"❌ Erreur TMDB pour '{self.title}': {e}")
+    @staticmethod
+    def _refresh_rating(key: str, entry: dict) -> dict:
+        # Détails partagés avec la résolution des titres (cache et limiteur) : jamais redemandés dans une exécution
+        with metrics.timer("tmdb.rating"):
+            details_data = get_tmdb_details(entry["tmdb_id"]).result()
+
+        refreshed = dict(entry)
+        if details_data:
+            refreshed["rating"] = format_tmdb_rating(details_data.get("vote_average"))
+            stamp_tmdb_rating(refreshed, entry)
+        else:
+            # Requête en échec : garder l'ancienne note et réessayer plus tard
+            refreshed["rating_misses"] = entry.get("rating_misses", 0) + 1
+            refreshed["rating_expires_at"] = int(time.time()) + _tmdb_backoff(refreshed["rating_misses"])
+        set_tmdb_cache(key, refreshed)
+        return refreshed
 
-        # Sauvegarder même les résultats par défaut pour éviter de refaire l'appel
-        _tmdb_cache[cache_key] = default_data
-        save_tmdb_cache()
 
-        return default_data
+class Showtime:
+    """Séance réduite aux champs sérialisés ; le film et le cinéma sont partagés, pas copiés."""
 
+    __slots__ = ("startsAt", "theater", "movie", "language", "format", "ticketing_url")
 
-class Showtime:
     def __init__(self, data, theather, movie: Movie, language: str = "VF", format: str = None) -> None:
         self.startsAt = datetime.fromisoformat(data["startsAt"])
-        self.diffusionVersion = data["diffusionVersion"]
-        self.services = data["service"]
         self.theater: Theater = theather
         self.movie = movie
         self.language = language  # VO ou VF
@@ -265,6 +918,8 @@ class Showtime:
 
 
 class Theater:
+    __slots__ = ("name", "id", "location", "latitude", "longitude")
+
     def __init__(self, data) -> None:
         self.name = data["name"]
         self.id = data["internalId"]
@@ -275,26 +930,64 @@ class Theater:
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__} name={self.name}>"
 
-    def getShowtimes(self, date: datetime, page: int = 1, showtimes: list = None) -> list[Showtime]:
-        if showtimes is None:
-            showtimes = []
+    def getShowtimes(self, date: datetime, executor: Executor | None = None) -> Iterator[Showtime]:
+        """Itère sur les séances d'une date, page par page, sans garder les pages déjà consommées.
 
+        Avec un `executor`, les pages 2..N sont préchargées en parallèle dès que la première page a
+        donné le nombre total de pages ; elles sont toujours restituées dans l'ordre.
+        """
+        showtimes, total_pages = self.getShowtimesPage(date, 1)
+        yield from showtimes
+
+        pages = range(2, total_pages + 1)
+        if executor is None:
+            for page in pages:
+                yield from self.getShowtimesPage(date, page)[0]
+        else:
+            futures = [executor.submit(self.getShowtimesPage, date, page) for page in pages]
+            for future in futures:
+                yield from future.result()[0]
+
+    def getShowtimesPage(
+        self, date: datetime, page: int = 1, skip_unchanged: bool = False
+    ) -> tuple[list[Showtime] | None, int]:
+        """Récupère une page de séances et retourne (séances, nombre total de pages).
+
+        Avec `skip_unchanged`, une page identique à la version en cache n'est pas analysée : les séances
+        valent alors None (le nombre de pages vient du cache)."""
         datestr = date.strftime("%Y-%m-%d")
-        r = requests.get(f"https://www.allocine.fr/_/showtimes/theater-{self.id}/d-{datestr}/p-{page}/")
+        # Seul l'appel réseau est mesuré : l'attente du limiteur, partagée par tous les cinémas, est dans "http.wait"
+        r = http_cache.fetch(
+            f"{ALLOCINE_BASE_URL}/_/showtimes/theater-{self.id}/d-{datestr}/p-{page}/",
+            stage="fetch",
+            labels={"theater": self.name, "date": datestr, "page": page},
+        )
 
-        if r.status_code != 200:
-            raise Exception(f"Error: {r.status_code} - {r.content}")
+        if r.status != 200:
+            raise Exception(f"Error: {r.status} - {r.body}")
 
-        try:
-            data = r.json()
-        except Exception as e:
-            raise Exception(f"Can't parse JSON: {str(e)} - {r.content}")
+        if skip_unchanged and r.unchanged and "total_pages" in r.info:
+            http_cache.increment("parse_skipped")
+            return None, r.info["total_pages"]
+
+        with metrics.timer("parse", theater=self.name, date=datestr, page=page):
+            try:
+                data = json.loads(r.body)
+            except Exception as e:
+                raise Exception(f"Can't parse JSON: {str(e)} - {r.body}")
+
+            showtimes, total_pages = self._parseShowtimesPage(data)
+        http_cache.store(r, {"total_pages": total_pages})
+        return showtimes, total_pages
+
+    def _parseShowtimesPage(self, data: dict) -> tuple[list[Showtime], int]:
+        showtimes = []
 
         if data["message"] == "no.showtime.error":
-            return []
+            return [], 1
 
         if data["message"] == "next.showtime.on":
-            return []
+            return [], 1
 
         if data.get("error"):
             raise Exception(f"API Error: {data}")
@@ -304,7 +997,7 @@ class Theater:
             if movie.get("movie") is None:
                 continue
 
-            inst = Movie(movie["movie"])
+            inst = Movie.intern(movie["movie"])
 
             # Récupérer toutes les séances avec leur langue
             showtimes_dict = movie.get("showtimes", {})
@@ -351,14 +1044,11 @@ class Theater:
         if total_pages > 1:
             print(f"      📄 {self.name}: page {current_page}/{total_pages}")
 
-        if int(current_page) < int(total_pages):
-            return self.getShowtimes(date, page + 1, showtimes)
-
-        return showtimes
+        return showtimes, int(total_pages)
 
     @staticmethod
     def new(query: str):
-        r = requests.get(f"https://www.allocine.fr/_/localization_city/{query}")
+        r = transport.get(f"{ALLOCINE_BASE_URL}/_/localization_city/{query}")
 
         try:
             data = r.json()
@@ -378,4 +1068,4 @@ if __name__ == "__main__":
 
     showtimes = cgr.getShowtimes(datetime.today())
 
-    print(showtimes[0])
+    print(next(showtimes, None))
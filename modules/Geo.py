@@ -0,0 +1,64 @@
+"""Index spatial des cinémas (configuration THEATERS) pour les recherches « autour de moi ».
+
+Grille régulière en degrés : chaque cinéma est rangé dans la case de ses coordonnées, une recherche
+ne parcourt que les cases qui recouvrent le rectangle englobant le cercle demandé, puis filtre par
+distance exacte (haversine). Le coût d'une requête dépend du rayon et de la densité locale, pas du
+nombre total de cinémas.
+"""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180  # Longueur d'un degré de latitude (≈ 111 km)
+CELL_DEGREES = 0.05  # Taille d'une case (≈ 5,5 km en latitude, ≈ 3,9 km en longitude à Lyon)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distance orthodromique entre deux points (km)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+    """Points nommés (cinémas) rangés dans une grille, construite une fois au démarrage."""
+
+    def __init__(self, theaters: list[dict], cell: float = CELL_DEGREES) -> None:
+        self.cell = cell
+        self.theaters = [theater for theater in theaters if theater.get("latitude") is not None]
+        self.grid: dict[tuple[int, int], list[dict]] = {}
+        for theater in self.theaters:
+            self.grid.setdefault(self._key(theater["latitude"], theater["longitude"]), []).append(theater)
+
+    def _key(self, lat: float, lon: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell), math.floor(lon / self.cell)
+
+    def nearby(self, lat: float, lon: float, radius_km: float) -> list[tuple[float, dict]]:
+        """Cinémas à moins de `radius_km` du point, du plus proche au plus lointain : [(distance, cinéma)]."""
+        dlat = radius_km / KM_PER_DEGREE
+        # Près des pôles, un degré de longitude tend vers 0 km : toute la bande de latitude est parcourue
+        cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+        dlon = radius_km / (KM_PER_DEGREE * cos_lat) if cos_lat > 1e-6 else 180.0
+
+        (lat_min, lon_min), (lat_max, lon_max) = self._key(lat - dlat, lon - dlon), self._key(lat + dlat, lon + dlon)
+        if (lat_max - lat_min + 1) * (lon_max - lon_min + 1) > len(self.grid):
+            # Rectangle plus grand que la grille occupée : parcourir les cases non vides
+            cells = [cell for (i, j), cell in self.grid.items() if lat_min <= i <= lat_max and lon_min <= j <= lon_max]
+        else:
+            cells = [
+                self.grid[i, j]
+                for i in range(lat_min, lat_max + 1)
+                for j in range(lon_min, lon_max + 1)
+                if (i, j) in self.grid
+            ]
+
+        result = []
+        for cell in cells:
+            for theater in cell:
+                distance = haversine_km(lat, lon, theater["latitude"], theater["longitude"])
+                if distance <= radius_km:
+                    result.append((distance, theater))
+        result.sort(key=lambda item: item[0])
+        return result
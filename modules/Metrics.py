@@ -0,0 +1,130 @@
+"""Métriques d'une exécution du scraper : compteurs, durées par étape et trace optionnelle.
+
+Les durées sont agrégées par étape ("fetch", "parse", "save"...) et, si l'appel les précise, par
+cinéma et par date : le résumé JSON de fin d'exécution montre quelles étapes et quels cinémas
+dominent la durée du workflow. La trace (format Chrome Trace Event, lisible dans Perfetto ou
+chrome://tracing) garde chaque mesure individuellement, avec son thread.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Dimensions agrégées séparément dans le résumé, en plus du total par étape
+GROUPS = ("theater", "date")
+
+
+def _timing() -> dict:
+    return {"count": 0, "total": 0.0, "max": 0.0}
+
+
+def _add(timing: dict, seconds: float):
+    timing["count"] += 1
+    timing["total"] += seconds
+    timing["max"] = max(timing["max"], seconds)
+
+
+def _report(timing: dict) -> dict:
+    count = timing["count"]
+    return {
+        "count": count,
+        "total_s": round(timing["total"], 4),
+        "avg_ms": round(timing["total"] / count * 1000, 2) if count else 0,
+        "max_ms": round(timing["max"] * 1000, 2),
+    }
+
+
+class Metrics:
+    """Compteurs et durées par étape, partagés entre threads."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.perf_counter()
+            self.started_at = time.time()
+            self._counters: dict[str, int] = {}
+            self._stages: dict[str, dict] = {}
+            self._groups: dict[str, dict[str, dict[str, dict]]] = {group: {} for group in GROUPS}
+            self._trace: list[dict] | None = None
+
+    def enable_trace(self) -> None:
+        """Conserve chaque mesure pour `write_trace` (désactivé par défaut : la mémoire croît avec le run)."""
+        with self._lock:
+            self._trace = []
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def record(self, stage: str, seconds: float, start: float | None = None, **labels) -> None:
+        """Ajoute une durée à une étape ; `labels` (theater, date, page...) précisent la mesure."""
+        with self._lock:
+            _add(self._stages.setdefault(stage, _timing()), seconds)
+            for group in GROUPS:
+                if labels.get(group) is not None:
+                    _add(self._groups[group].setdefault(str(labels[group]), {}).setdefault(stage, _timing()), seconds)
+            if self._trace is not None:
+                start = time.perf_counter() - seconds if start is None else start
+                self._trace.append(
+                    {
+                        "name": stage,
+                        "ph": "X",
+                        "ts": round((start - self.started) * 1e6),
+                        "dur": round(seconds * 1e6),
+                        "pid": os.getpid(),
+                        "tid": threading.get_ident(),
+                        "args": {key: str(value) for key, value in labels.items()},
+                    }
+                )
+
+    @contextmanager
+    def timer(self, stage: str, **labels):
+        """Mesure la durée du bloc (y compris s'il lève une exception)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, start, **labels)
+
+    def summary(self, **extra) -> dict:
+        """Résumé JSON : compteurs, durées par étape, puis par cinéma et par date (du plus lent au plus rapide)."""
+        with self._lock:
+            result = {
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+                "duration_s": round(time.perf_counter() - self.started, 3),
+                "counters": dict(sorted(self._counters.items())),
+                "stages": {stage: _report(timing) for stage, timing in sorted(self._stages.items())},
+            }
+            for group, values in self._groups.items():
+                ranked = sorted(values.items(), key=lambda item: -sum(t["total"] for t in item[1].values()))
+                result[f"by_{group}"] = {
+                    value: {
+                        "total_s": round(sum(timing["total"] for timing in stages.values()), 4),
+                        **{stage: _report(timing) for stage, timing in sorted(stages.items())},
+                    }
+                    for value, stages in ranked
+                }
+        result.update(extra)
+        return result
+
+    def write_summary(self, path: str, **extra) -> dict:
+        summary = self.summary(**extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
+
+    def write_trace(self, path: str) -> int:
+        """Écrit la trace (si activée) ; retourne le nombre d'évènements écrits."""
+        with self._lock:
+            events = list(self._trace or [])
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+
+metrics = Metrics()
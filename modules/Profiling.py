@@ -0,0 +1,255 @@
+"""Instrumentation optionnelle des requêtes Flask : durées par phase, histogrammes glissants et profils.
+
+Activée par APP_PROFILING=1 (sans effet sinon) :
+
+- chaque réponse porte un en-tête `Server-Timing` (phases mesurées par `profiler.phase(...)`, plus
+  `after` pour les hooks after_request dont Flask-Compress, et `total`), visible dans les outils
+  de développement du navigateur ;
+- les durées alimentent des histogrammes glissants par route et par phase, servis en JSON par
+  `/metrics` si METRICS_TOKEN est défini (en-tête `Authorization: Bearer <token>`) ;
+- une fraction des requêtes (PROFILE_SAMPLE_RATE) est exécutée sous cProfile, et le profil est
+  écrit dans PROFILE_DIR si la requête a dépassé PROFILE_SLOW_MS (`python -m pstats fichier.prof`).
+
+Les histogrammes sont propres à chaque processus (chaque instance Vercel a les siens).
+"""
+
+import bisect
+import cProfile
+import hmac
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from flask import g, has_request_context, jsonify, request
+
+PROFILING_ENABLED = os.environ.get("APP_PROFILING", "") == "1"
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "200"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "cinelyon-profiles"))
+PROFILE_MAX_FILES = 50  # Les profils les plus anciens sont supprimés au-delà
+
+# Bornes supérieures des classes des histogrammes (ms) ; la dernière classe est ouverte
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+HISTOGRAM_WINDOW = 60  # Durée d'un créneau (secondes)
+HISTOGRAM_SLOTS = 60  # Créneaux conservés : la dernière heure
+
+
+class RollingHistogram:
+    """Histogramme de durées sur une fenêtre glissante, découpée en créneaux recyclés au fil du temps."""
+
+    def __init__(self, bounds=HISTOGRAM_BOUNDS_MS, window: float = HISTOGRAM_WINDOW, slots: int = HISTOGRAM_SLOTS):
+        self.bounds = bounds
+        self.window = window
+        # Par créneau : [numéro du créneau, compte par classe, somme, maximum]
+        self._slots = [[-1, [0] * (len(bounds) + 1), 0.0, 0.0] for _ in range(slots)]
+
+    def _slot(self, now: float) -> list:
+        number = int(now // self.window)
+        slot = self._slots[number % len(self._slots)]
+        if slot[0] != number:
+            slot[:] = [number, [0] * (len(self.bounds) + 1), 0.0, 0.0]
+        return slot
+
+    def add(self, ms: float, now: float | None = None) -> None:
+        slot = self._slot(time.time() if now is None else now)
+        slot[1][bisect.bisect_left(self.bounds, ms)] += 1
+        slot[2] += ms
+        slot[3] = max(slot[3], ms)
+
+    def report(self, now: float | None = None) -> dict:
+        """Compte, moyenne, maximum, quantiles (borne supérieure de leur classe) et classes non vides."""
+        oldest = int((time.time() if now is None else now) // self.window) - len(self._slots) + 1
+        counts = [0] * (len(self.bounds) + 1)
+        total = maximum = 0.0
+        for number, slot_counts, slot_total, slot_max in self._slots:
+            if number >= oldest:
+                counts = [a + b for a, b in zip(counts, slot_counts)]
+                total += slot_total
+                maximum = max(maximum, slot_max)
+
+        count = sum(counts)
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        result = {
+            "count": count,
+            "avg_ms": round(total / count, 2) if count else 0,
+            "max_ms": round(maximum, 2),
+            "buckets_ms": {label: n for label, n in zip(labels, counts) if n},
+        }
+        for name, quantile in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+            result[f"{name}_ms"] = self._quantile(counts, count * quantile) if count else None
+        return result
+
+    def _quantile(self, counts: list[int], rank: float):
+        seen = 0
+        for i, n in enumerate(counts):
+            seen += n
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else f">{self.bounds[-1]}"
+
+
+class RequestProfiler:
+    """Extension Flask : phases par requête, en-tête Server-Timing, histogrammes et profils des requêtes lentes.
+
+    `init_app` doit être appelé après l'enregistrement des autres hooks after_request (Compress, Talisman...)
+    pour que la phase `after` les couvre tous."""
+
+    def __init__(self, app=None, enabled: bool = PROFILING_ENABLED) -> None:
+        self.enabled = enabled
+        self.sample_rate = PROFILE_SAMPLE_RATE
+        self.slow_ms = PROFILE_SLOW_MS
+        self.profile_dir = PROFILE_DIR
+        self.started = time.time()
+        self._histograms: dict[str, RollingHistogram] = {}
+        self._lock = threading.Lock()
+        # Un seul profil à la fois : depuis Python 3.12, deux cProfile actifs en même temps lèvent ValueError
+        self._profile_lock = threading.Lock()
+        self.profiles_written = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        if not self.enabled:
+            return
+        app.before_request(self._start)
+        # Hooks after_request exécutés dans l'ordre inverse d'enregistrement : le marqueur (ajouté en dernier)
+        # s'exécute juste après la vue, `_finish` (inséré en tête) après tous les autres
+        app.after_request(self._view_done)
+        app.after_request_funcs.setdefault(None, []).insert(0, self._finish)
+        app.teardown_request(self._teardown)
+        app.add_url_rule("/metrics", "metrics", self._metrics_endpoint)
+
+    @contextmanager
+    def _timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            g.profiling_phases.append((name, (time.perf_counter() - start) * 1000))
+
+    def phase(self, name: str):
+        """Mesure un bloc comme phase de la requête en cours (sans effet si désactivé ou hors requête)."""
+        if not self.enabled or not has_request_context() or "profiling_phases" not in g:
+            return nullcontext()
+        return self._timed(name)
+
+    def note(self, name: str, description: str) -> None:
+        """Ajoute une entrée descriptive (sans durée) à l'en-tête Server-Timing, ex. cache=hit."""
+        if self.enabled and has_request_context() and "profiling_notes" in g:
+            g.profiling_notes.append((name, description))
+
+    def _start(self):
+        g.profiling_start = time.perf_counter()
+        g.profiling_phases = []
+        g.profiling_notes = []
+        g.profiling_view_done = None
+        g.profiler = None
+        if self.sample_rate and random.random() < self.sample_rate and self._profile_lock.acquire(blocking=False):
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Autre outil de profilage actif dans le processus : requête non échantillonnée
+                self._profile_lock.release()
+                return
+            g.profiler = profile
+
+    def _stop_profile(self) -> cProfile.Profile | None:
+        """Arrête le profil de la requête s'il a démarré (une seule fois) et libère le verrou."""
+        profile = g.pop("profiler", None)
+        if profile is None:
+            return None
+        try:
+            profile.disable()
+        finally:
+            self._profile_lock.release()
+        return profile
+
+    def _teardown(self, exc):
+        # Requête interrompue avant `_finish` (exception dans un hook) : le profil ne doit pas rester actif
+        if "profiler" in g:
+            self._stop_profile()
+
+    def _view_done(self, response):
+        g.profiling_view_done = time.perf_counter()
+        return response
+
+    def _finish(self, response):
+        if "profiling_start" not in g:
+            return response
+        end = time.perf_counter()
+        total_ms = (end - g.profiling_start) * 1000
+        profile = self._stop_profile()
+        if profile is not None and total_ms >= self.slow_ms:
+            try:
+                self._write_profile(profile, total_ms)
+            except OSError as e:
+                print(f"⚠️ Profil non écrit : {e}")
+
+        phases = list(g.profiling_phases)
+        if g.profiling_view_done is not None:
+            phases.append(("after", (end - g.profiling_view_done) * 1000))
+        phases.append(("total", total_ms))
+
+        entries = [f"{name};dur={ms:.2f}" for name, ms in phases]
+        entries += [f'{name};desc="{description}"' for name, description in g.profiling_notes]
+        response.headers["Server-Timing"] = ", ".join(entries)
+
+        endpoint = request.endpoint or "404"
+        now = time.time()
+        with self._lock:
+            for name, ms in phases:
+                key = endpoint if name == "total" else f"{endpoint}.{name}"
+                self._histograms.setdefault(key, RollingHistogram()).add(ms, now)
+        return response
+
+    def _write_profile(self, profiler: cProfile.Profile, total_ms: float) -> None:
+        """Écrit le profil d'une requête lente et ne garde que les PROFILE_MAX_FILES plus récents."""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or '404'}-{total_ms:.0f}ms.prof"
+        profiler.dump_stats(os.path.join(self.profile_dir, name))
+        self.profiles_written += 1
+
+        profiles = sorted(
+            (entry for entry in os.scandir(self.profile_dir) if entry.name.endswith(".prof")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in profiles[:-PROFILE_MAX_FILES]:
+            os.remove(entry.path)
+
+    def authorized(self) -> bool:
+        """Vrai si la requête porte le jeton METRICS_TOKEN (comparaison à temps constant)."""
+        header = request.headers.get("Authorization", "")
+        return bool(METRICS_TOKEN) and hmac.compare_digest(header.encode(), f"Bearer {METRICS_TOKEN}".encode())
+
+    def _metrics_endpoint(self):
+        if not METRICS_TOKEN:
+            return "Not Found", 404
+        if not self.authorized():
+            return "Unauthorized", 401, {"WWW-Authenticate": "Bearer"}
+
+        now = time.time()
+        with self._lock:
+            histograms = {key: histogram.report(now) for key, histogram in sorted(self._histograms.items())}
+        response = jsonify(
+            {
+                "pid": os.getpid(),
+                "uptime_s": round(now - self.started),
+                "window_s": HISTOGRAM_WINDOW * HISTOGRAM_SLOTS,
+                "profiles": {
+                    "sample_rate": self.sample_rate,
+                    "slow_ms": self.slow_ms,
+                    "dir": self.profile_dir,
+                    "written": self.profiles_written,
+                },
+                "histograms": histograms,
+            }
+        )
+        response.headers["Cache-Control"] = "no-store"
+        return response
+
+
+profiler = RequestProfiler()
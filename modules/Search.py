@@ -0,0 +1,140 @@
+"""Recherche plein texte des films, insensible aux accents et tolérante aux fautes de frappe.
+
+Index inversé construit à chaque chargement des données (à partir des films du catalogue) :
+
+- mot normalisé (accents retirés, minuscules) -> {film: score}, le score dépendant du champ
+  (titre, titre original, réalisateur, genres, synopsis) ;
+- vocabulaire trié pour les préfixes (recherche au fil de la frappe : « ava » trouve « avatar ») ;
+- trigrammes -> mots du vocabulaire, pour les mots mal orthographiés (« avtar », « camron ») quand ni
+  le mot exact ni un préfixe ne correspondent ; construits à la première recherche qui en a besoin.
+
+Seul l'index des mots est gardé dans l'instantané binaire (via l'état du catalogue).
+
+Une requête ne parcourt que les listes des mots demandés : son coût dépend de la requête et non du
+nombre de films.
+"""
+
+import bisect
+import re
+import unicodedata
+
+# Poids d'un mot selon le champ où il apparaît (le meilleur champ l'emporte)
+FIELD_WEIGHTS = {"title": 10.0, "original_title": 8.0, "director": 6.0, "genres": 4.0, "synopsis": 1.0}
+PREFIX_FACTOR = 0.7  # Mot du film commençant par le mot cherché
+PREFIX_MIN_LENGTH = 2
+PREFIX_MAX_WORDS = 200  # Mots complétés au plus par préfixe (borne le coût des requêtes d'une lettre ou deux)
+FUZZY_FACTOR = 0.5  # Mot proche (trigrammes), multiplié par la similarité
+FUZZY_MIN_LENGTH = 4  # Mots plus courts : trop de voisins pour une correction fiable
+FUZZY_MIN_SIMILARITY = 0.45  # Coefficient de Dice minimal entre trigrammes
+MAX_QUERY_WORDS = 8
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def fold(text: str) -> str:
+    """Minuscules sans accents ni ponctuation (« Amélie, l'été » -> « amelie l ete »), comme `slugify`."""
+    text = unicodedata.normalize("NFD", text or "").encode("ascii", "ignore").decode("ascii")
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def words(text: str) -> list[str]:
+    return fold(text).split()
+
+
+def trigrams(word: str) -> set[str]:
+    padded = f" {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Index inversé des films du catalogue (identifiants de `Catalog.films`, par intérêt décroissant)."""
+
+    def __init__(self, films: list[dict]) -> None:
+        postings: dict[str, dict[int, float]] = {}
+        for film in films:
+            fields = {
+                "title": film["title"],
+                "original_title": film.get("original_title"),
+                "director": film["director"] if film["director"] != "Inconnu" else "",
+                "genres": " ".join(film["genres"]),
+                "synopsis": film["synopsis"],
+            }
+            # Champs par poids décroissant : le premier poids enregistré pour un film est le meilleur
+            for field, text in fields.items():
+                weight = FIELD_WEIGHTS[field]
+                for word in words(text):
+                    postings.setdefault(word, {}).setdefault(film["id"], weight)
+        self._load(postings)
+
+    def _load(self, postings: dict[str, dict[int, float]]) -> None:
+        self.postings = postings
+        self.vocabulary = sorted(postings)
+        self._trigrams: dict[str, list[str]] | None = None
+
+    def state(self) -> dict:
+        return {"postings": self.postings}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "SearchIndex":
+        index = cls.__new__(cls)
+        index._load(state["postings"])
+        return index
+
+    def trigram_index(self) -> dict[str, list[str]]:
+        """Trigramme -> mots du vocabulaire (construit au premier besoin, publié en une affectation)."""
+        if self._trigrams is None:
+            index: dict[str, list[str]] = {}
+            for word in self.vocabulary:
+                if len(word) >= FUZZY_MIN_LENGTH - 1:
+                    for trigram in trigrams(word):
+                        index.setdefault(trigram, []).append(word)
+            self._trigrams = index
+        return self._trigrams
+
+    def _expand(self, word: str) -> dict[str, float]:
+        """Mots de l'index correspondant à un mot de la requête, avec leur facteur (exact, préfixe, proche)."""
+        matches = {}
+        if word in self.postings:
+            matches[word] = 1.0
+        if len(word) >= PREFIX_MIN_LENGTH:
+            start = bisect.bisect_left(self.vocabulary, word)
+            for candidate in self.vocabulary[start : start + PREFIX_MAX_WORDS]:
+                if not candidate.startswith(word):
+                    break
+                matches.setdefault(candidate, PREFIX_FACTOR)
+        if matches or len(word) < FUZZY_MIN_LENGTH:
+            return matches
+
+        query = trigrams(word)
+        index = self.trigram_index()
+        shared: dict[str, int] = {}
+        for trigram in query:
+            for candidate in index.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        for candidate, count in shared.items():
+            similarity = 2 * count / (len(query) + len(candidate))  # Un mot de n lettres a n trigrammes
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                matches[candidate] = FUZZY_FACTOR * similarity
+        return matches
+
+    def search(self, query: str, limit: int = 20) -> list[tuple[int, float]]:
+        """Films contenant tous les mots de la requête (exacts, préfixes ou proches), du plus pertinent au moins
+        pertinent, puis par intérêt : [(identifiant, score)]."""
+        scores: dict[int, float] | None = None
+        for word in dict.fromkeys(words(query[:200])[:MAX_QUERY_WORDS]):
+            word_scores: dict[int, float] = {}
+            for candidate, factor in self._expand(word).items():
+                for film_id, weight in self.postings[candidate].items():
+                    if weight * factor > word_scores.get(film_id, 0.0):
+                        word_scores[film_id] = weight * factor
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {
+                    film_id: score + word_scores[film_id] for film_id, score in scores.items() if film_id in word_scores
+                }
+            if not scores:
+                return []
+
+        ranked = sorted((scores or {}).items(), key=lambda item: (-item[1], item[0]))
+        return [(film_id, round(score, 3)) for film_id, score in ranked[:limit]]
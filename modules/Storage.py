@@ -0,0 +1,279 @@
+"""Stockage des séances sur disque : une table de films normalisée, un fichier par jour et un manifeste.
+
+    data/
+    ├── manifest.json        # date de génération, fichiers et empreintes (sha256)
+    ├── films.json           # métadonnées des films, indexées par identifiant
+    ├── days/2026-10-17.json # séances du jour, par film (identifiant) et par cinéma
+    ├── snapshot.pickle      # les mêmes données précompilées en colonnes, pour un démarrage rapide
+    └── freshness.json       # date de récupération et empreinte de chaque (jour, cinéma), pour le scraper
+
+Seuls les fichiers dont le contenu a changé sont réécrits : les commits du scraper ne contiennent
+que les vraies différences, et l'application ne relit que les fichiers dont l'empreinte a changé.
+L'instantané et la fraîcheur ne sont pas versionnés : l'instantané est écrit en fin de scraping, ou
+par l'application au premier chargement s'il manque ou ne correspond plus au manifeste.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from array import array
+from datetime import date
+
+from modules.Catalog import Catalog, time_to_minutes
+
+DATA_DIR = "data"
+MANIFEST_FILE = "manifest.json"
+FILMS_FILE = "films.json"
+DAYS_DIR = "days"
+SNAPSHOT_FILE = "snapshot.pickle"
+FRESHNESS_FILE = "freshness.json"
+SNAPSHOT_FORMAT = 3  # À incrémenter si la structure de l'instantané change
+SNAPSHOT_PROTOCOL = 5  # Protocole pickle fixe : lisible par toutes les versions de Python supportées
+
+
+def film_id(title: str) -> str:
+    """Identifiant stable d'un film (les films d'un jour sont uniques par titre)."""
+    return hashlib.sha1(title.encode("utf-8")).hexdigest()[:12]
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def dump_json(data) -> bytes:
+    """Sérialisation déterministe : un même contenu donne toujours les mêmes octets (et la même empreinte)."""
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def split_days(days: list[dict]) -> tuple[dict, list[dict]]:
+    """Sépare des jours au format {"date", "movies"} en table de films et en jours ne référençant que des identifiants.
+
+    Pour un film présent plusieurs jours, les métadonnées du jour le plus récent l'emportent."""
+    films = {}
+    shards = []
+    for day in days:
+        showtimes = []
+        for movie in day.get("movies", []):
+            fid = film_id(movie["title"])
+            films[fid] = {field: value for field, value in movie.items() if field != "seances"}
+            showtimes.append({"film": fid, "seances": movie["seances"]})
+        shards.append({"date": day["date"], "showtimes": showtimes})
+    return dict(sorted(films.items())), shards
+
+
+def join_day(films: dict, shard: dict) -> dict:
+    """Reconstruit un jour au format {"date", "movies"} (films complets avec leurs séances)."""
+    movies = [
+        {**films[showtime["film"]], "seances": showtime["seances"]}
+        for showtime in shard["showtimes"]
+        if showtime["film"] in films
+    ]
+    return {"date": shard["date"], "movies": movies}
+
+
+def _write_atomic(path: str, body: bytes):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+def read_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_manifest(data_dir: str = DATA_DIR) -> dict | None:
+    """Manifeste des données (None s'il n'existe pas encore)."""
+    path = os.path.join(data_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    return read_json(path)
+
+
+def read_data(data_dir: str = DATA_DIR) -> dict | None:
+    """Relit toutes les données au format {"generated_at", "days": [{"date", "movies"}]} (None sans manifeste)."""
+    manifest = read_manifest(data_dir)
+    if manifest is None:
+        return None
+    films = read_json(os.path.join(data_dir, manifest["films"]["file"]))
+    days = [join_day(films, read_json(os.path.join(data_dir, day["file"]))) for day in manifest["days"]]
+    return {"generated_at": manifest["generated_at"], "days": days}
+
+
+def read_freshness(data_dir: str = DATA_DIR) -> dict:
+    """Fraîcheur des données scrapées : {date: {identifiant du cinéma: {"fetched_at", "sha256"}}}."""
+    path = os.path.join(data_dir, FRESHNESS_FILE)
+    if not os.path.exists(path):
+        return {}
+    return read_json(path)
+
+
+def write_freshness(freshness: dict, data_dir: str = DATA_DIR):
+    _write_atomic(os.path.join(data_dir, FRESHNESS_FILE), dump_json(dict(sorted(freshness.items()))))
+
+
+def write_data(days: list[dict], generated_at: str, data_dir: str = DATA_DIR) -> list[str]:
+    """Écrit les jours donnés en ne réécrivant que les fichiers modifiés ; le manifeste est écrit en dernier.
+
+    Les fichiers de jours absents de `days` sont supprimés. Retourne les fichiers réécrits ou supprimés."""
+    previous = read_manifest(data_dir) or {"generated_at": None, "films": {}, "days": []}
+    previous_hashes = {previous["films"].get("file"): previous["films"].get("sha256")}
+    previous_hashes.update({day["file"]: day["sha256"] for day in previous["days"]})
+
+    films, shards = split_days(days)
+    files = [(FILMS_FILE, films)] + [(f"{DAYS_DIR}/{shard['date']}.json", shard) for shard in shards]
+
+    changed = []
+    hashes = {}
+    for name, data in files:
+        body = dump_json(data)
+        hashes[name] = content_hash(body)
+        if previous_hashes.get(name) != hashes[name] or not os.path.exists(os.path.join(data_dir, name)):
+            _write_atomic(os.path.join(data_dir, name), body)
+            changed.append(name)
+
+    for name in previous_hashes:
+        if name and name not in hashes and os.path.exists(os.path.join(data_dir, name)):
+            os.remove(os.path.join(data_dir, name))
+            changed.append(name)
+
+    if not changed and previous["generated_at"]:
+        return changed
+
+    manifest = {
+        "generated_at": generated_at,
+        "films": {"file": FILMS_FILE, "sha256": hashes[FILMS_FILE], "count": len(films)},
+        "days": [
+            {
+                "date": shard["date"],
+                "file": f"{DAYS_DIR}/{shard['date']}.json",
+                "sha256": hashes[f"{DAYS_DIR}/{shard['date']}.json"],
+                "films": len(shard["showtimes"]),
+            }
+            for shard in shards
+        ],
+    }
+    _write_atomic(os.path.join(data_dir, MANIFEST_FILE), dump_json(manifest))
+    return changed
+
+
+def manifest_sources(manifest: dict) -> dict:
+    """Fichiers du manifeste et leurs empreintes : l'instantané n'est valide que pour ces sources."""
+    sources = {manifest["films"]["file"]: manifest["films"]["sha256"]}
+    sources.update({day["file"]: day["sha256"] for day in manifest["days"]})
+    return sources
+
+
+def write_snapshot(
+    days: list[dict], generated_at: str, sources: dict, data_dir: str = DATA_DIR, catalog: Catalog | None = None
+):
+    """Écrit l'instantané binaire : table des films, tables de chaînes et séances en colonnes d'entiers.
+
+    Les séances sont gardées dans l'ordre des fichiers (jour, film, cinéma) pour reconstruire les jours à
+    l'identique ; le catalogue de l'API en garde l'ordre trié (permutation) et les index inversés.
+    `catalog`, s'il est déjà construit sur ces mêmes jours, n'est pas recalculé."""
+    if catalog is None:
+        catalog = Catalog([(date.fromisoformat(day["date"]), day["movies"]) for day in days])
+    films, _ = split_days(days)
+    film_ids = {film["title"]: film["id"] for film in catalog.films}
+    cinema_ids = {name: i for i, name in enumerate(catalog.cinemas)}
+    langs, formats = [], [None]
+    lang_ids, format_ids = {}, {None: 0}
+
+    day_films = []
+    columns = {field: array("H") for field in ("day", "minutes", "film", "cinema", "lang", "format")}
+    ticketing_urls = []
+    for day_index, day in enumerate(days):
+        day_films.append(array("H", (film_ids[movie["title"]] for movie in day["movies"])))
+        for movie in day["movies"]:
+            for cinema, seances in movie["seances"].items():
+                for seance in seances:
+                    lang, format_ = seance["lang"], seance.get("format")
+                    if lang not in lang_ids:
+                        lang_ids[lang] = len(langs)
+                        langs.append(lang)
+                    if format_ not in format_ids:
+                        format_ids[format_] = len(formats)
+                        formats.append(format_)
+                    columns["day"].append(day_index)
+                    columns["minutes"].append(time_to_minutes(seance["time"]))
+                    columns["film"].append(film_ids[movie["title"]])
+                    columns["cinema"].append(cinema_ids[cinema])
+                    columns["lang"].append(lang_ids[lang])
+                    columns["format"].append(format_ids[format_])
+                    ticketing_urls.append(seance.get("ticketing_url"))
+
+    # Même tri (stable) que les séances du catalogue
+    order = sorted(
+        range(len(ticketing_urls)),
+        key=lambda i: (columns["day"][i], columns["minutes"][i], columns["film"][i], columns["cinema"][i]),
+    )
+    state = catalog.state()
+    del state["rows"]
+
+    snapshot = {
+        "format": SNAPSHOT_FORMAT,
+        "generated_at": generated_at,
+        "sources": sources,
+        "dates": [day["date"] for day in days],
+        "films": [films[film_id(film["title"])] for film in catalog.films],
+        "langs": langs,
+        "formats": formats,
+        "day_films": day_films,
+        "seances": {**columns, "ticketing_url": ticketing_urls},
+        "order": array("I", order),
+        "catalog": state,
+    }
+    _write_atomic(os.path.join(data_dir, SNAPSHOT_FILE), pickle.dumps(snapshot, protocol=SNAPSHOT_PROTOCOL))
+
+
+def read_snapshot(manifest: dict, data_dir: str = DATA_DIR) -> dict | None:
+    """Relit l'instantané s'il correspond au manifeste : {"days": [{"date", "movies"}], "catalog": état du catalogue}.
+
+    Retourne None (relecture des fichiers JSON) s'il est absent, d'un autre format ou en retard sur le manifeste."""
+    path = os.path.join(data_dir, SNAPSHOT_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+
+    if snapshot.get("format") != SNAPSHOT_FORMAT or snapshot.get("sources") != manifest_sources(manifest):
+        return None
+
+    films, cinemas = snapshot["films"], snapshot["catalog"]["cinemas"]
+    langs, formats = snapshot["langs"], snapshot["formats"]
+    seances = snapshot["seances"]
+    rows = list(
+        zip(
+            seances["day"],
+            seances["minutes"],
+            seances["film"],
+            seances["cinema"],
+            [langs[i] for i in seances["lang"]],
+            [formats[i] for i in seances["format"]],
+            seances["ticketing_url"],
+        )
+    )
+
+    days = []
+    movies = {}
+    for day_index, (day, film_ids) in enumerate(zip(snapshot["dates"], snapshot["day_films"])):
+        day_movies = []
+        for film in film_ids:
+            movies[day_index, film] = {**films[film], "seances": {}}
+            day_movies.append(movies[day_index, film])
+        days.append({"date": day, "movies": day_movies})
+
+    for day_index, minutes, film, cinema, lang, format_, ticketing_url in rows:
+        seance = {"time": f"{minutes // 60:02d}:{minutes % 60:02d}", "lang": lang, "format": format_}
+        seance["ticketing_url"] = ticketing_url
+        movies[day_index, film]["seances"].setdefault(cinemas[cinema], []).append(seance)
+
+    state = {**snapshot["catalog"], "rows": [rows[i] for i in snapshot["order"]]}
+    return {"generated_at": snapshot["generated_at"], "days": days, "catalog": state}
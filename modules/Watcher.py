@@ -0,0 +1,109 @@
+"""Données publiées par échange atomique de référence, reconstruites en arrière-plan quand leur source change.
+
+Un thread de surveillance compare périodiquement la version de la source (ex. mtime du manifeste) à celle
+de l'instantané publié ; en cas de changement, le nouvel instantané est construit hors du chemin des
+requêtes puis publié par une simple affectation. Les requêtes lisent `watcher.current` sans appel
+système ni verrou, et gardent l'instantané qu'elles ont lu jusqu'à la fin de leur traitement.
+
+La surveillance se fait par scrutation (`os.stat` toutes les `interval` secondes) : inotify n'est pas
+disponible sur toutes les plateformes (Vercel, macOS) et la bibliothèque standard n'en fournit pas.
+"""
+
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+WATCH_INTERVAL = float(os.environ.get("DATA_WATCH_INTERVAL", "2"))  # 0 = pas de thread de surveillance
+RELOAD_DEBOUNCE = float(os.environ.get("RELOAD_DEBOUNCE", "10"))  # Délai minimal entre deux rechargements forcés
+
+
+class SnapshotWatcher:
+    """Instantané courant d'une source de données, remplacé en arrière-plan quand sa version change.
+
+    `version()` doit être peu coûteux (un stat) ; `build(previous, version, force)` construit le nouvel
+    instantané, en réutilisant `previous` quand c'est possible. Les constructions sont sérialisées."""
+
+    def __init__(
+        self,
+        version: Callable[[], Any],
+        build: Callable[[Any, Any, bool], Any],
+        interval: float = WATCH_INTERVAL,
+        debounce: float = RELOAD_DEBOUNCE,
+    ) -> None:
+        self.version = version
+        self.build = build
+        self.interval = interval
+        self.debounce = debounce
+        self.current = None
+        self.current_version = None
+        self.last_forced = float("-inf")
+        self._lock = threading.Lock()  # Sérialise les constructions
+        self._start_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def refresh(self, force: bool = False, wait: bool = True) -> bool:
+        """Reconstruit et publie l'instantané si la source a changé (ou si `force`).
+
+        Sans `wait`, rend la main immédiatement si une construction est déjà en cours : l'appelant
+        continue avec l'instantané courant. Retourne True si un nouvel instantané a été publié."""
+        if not self._lock.acquire(blocking=wait):
+            return False
+        try:
+            return self._publish(force)
+        finally:
+            self._lock.release()
+
+    def reload(self) -> str:
+        """Rechargement forcé, limité à un par `debounce` secondes et jamais concurrent d'une construction.
+
+        Retourne "reloaded", "busy" (une construction est en cours, elle en tiendra lieu) ou
+        "debounced" (rechargement trop récent)."""
+        if not self._lock.acquire(blocking=False):
+            return "busy"
+        try:
+            if time.monotonic() - self.last_forced < self.debounce:
+                return "debounced"
+            self.last_forced = time.monotonic()
+            self._publish(force=True)
+            return "reloaded"
+        finally:
+            self._lock.release()
+
+    def _publish(self, force: bool) -> bool:
+        version = self.version()
+        if not force and self.current is not None and version == self.current_version:
+            return False
+        snapshot = self.build(self.current, version, force)
+        # Publication : une seule affectation, atomique pour les threads qui lisent `current`
+        self.current, self.current_version = snapshot, version
+        return True
+
+    def retry_after(self) -> int:
+        """Secondes avant qu'un nouveau rechargement forcé soit accepté."""
+        return max(1, round(self.debounce - (time.monotonic() - self.last_forced)))
+
+    def ensure_started(self) -> None:
+        """Démarre le thread de surveillance s'il ne tourne pas (premier appel, ou après un fork)."""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="data-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                if self.refresh():
+                    print("🔄 Nouvelles données publiées par le thread de surveillance")
+            except Exception as e:
+                # L'instantané courant reste servi ; nouvel essai au prochain passage
+                print(f"❌ Échec du rechargement en arrière-plan : {e}")
@@ -1,21 +1,44 @@
 #!/usr/bin/env python3
 """
 Script de scraping autonome pour récupérer les séances de cinéma.
-Sauvegarde les données dans movies.json.
+Sauvegarde les données dans data/ (manifeste, table des films, un fichier par jour).
 Conçu pour être exécuté via GitHub Actions.
 Supporte le scraping incrémental et la reprise après échec.
 """
 
 import argparse
+import hashlib
 import json
 import logging
 import os
-import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from typing import Callable
 
 from dotenv import load_dotenv
 
-from modules.Classes import TMDB_CACHE_FILE, Theater
+from modules.Classes import (
+    Showtime,
+    Theater,
+    TmdbEnricher,
+    clear_tmdb_cache,
+    close_tmdb_cache,
+    flush_tmdb_cache,
+    http_cache,
+    letterboxd_url,
+    transport,
+)
+from modules.Metrics import metrics
+from modules.Storage import (
+    DATA_DIR,
+    manifest_sources,
+    read_data,
+    read_freshness,
+    read_manifest,
+    write_data,
+    write_freshness,
+    write_snapshot,
+)
 
 load_dotenv(".env")
 
@@ -26,34 +49,50 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 TMDB_API_KEY = os.environ.get("TMDB_API_KEY", "")
-OUTPUT_FILE = "movies.json"
+LEGACY_OUTPUT_FILE = "movies.json"  # Ancien format (un seul fichier), relu une fois pour migrer
 DAYS_TO_SCRAPE = 10
-DELAY_BETWEEN_THEATERS = 2  # Délai en secondes entre chaque cinéma
-
+MAX_WORKERS = int(os.environ.get("SCRAPE_WORKERS", "6"))  # Requêtes Allociné en parallèle
+# Âge au-delà duquel les séances d'un cinéma pour une date déjà scrapée sont récupérées à nouveau. Doit rester
+# sous le plus court intervalle entre deux exécutions planifiées (scrape.yml : 9h00 et 19h30 UTC, soit 10h30)
+SCRAPE_MAX_AGE_HOURS = float(os.environ.get("SCRAPE_MAX_AGE_HOURS", "10"))
+# Résumé JSON des métriques de l'exécution (vide = désactivé) et trace détaillée optionnelle
+METRICS_FILE = os.environ.get("SCRAPE_METRICS_FILE", "scrape_metrics.json")
+TRACE_FILE = os.environ.get("SCRAPE_TRACE_FILE", "")
+
+
+def aggregate_showtimes(data: dict, showtimes: list[Showtime]):
+    """Ajoute des séances aux films d'une journée (dictionnaire indexé par titre)."""
+    for showtime in showtimes:
+        movie = showtime.movie
+        theater = showtime.theater
 
-def get_showtimes(theaters: list[Theater], date: datetime) -> list[dict]:
-    """Récupère les séances pour une date donnée (séquentiel avec délai)."""
-    showtimes_list = []
+        if movie.title not in data.keys():
+            data[movie.title] = {"movie": movie, "seances": {}}
 
-    for i, theater in enumerate(theaters):
-        try:
-            showtimes_list.extend(theater.getShowtimes(date))
-        except Exception as e:
-            logger.error(f"Erreur pour {theater.name}: {e}")
+        if theater.name not in data[movie.title]["seances"].keys():
+            data[movie.title]["seances"][theater.name] = []
 
-        # Délai entre les requêtes pour éviter le rate limiting (sauf pour le dernier)
-        if i < len(theaters) - 1:
-            time.sleep(DELAY_BETWEEN_THEATERS)
+        data[movie.title]["seances"][theater.name].append(
+            {
+                "time": showtime.startsAt.strftime("%H:%M"),
+                "lang": showtime.language,
+                "format": showtime.format,
+                "ticketing_url": showtime.ticketing_url,
+            }
+        )
 
-    data = {}
 
-    for showtime in showtimes_list:
-        movie = showtime.movie
-        theater = showtime.theater
+def finalize_day(data: dict, theaters: list[Theater]) -> list[dict]:
+    """Sérialise les films (enrichis) d'une journée, triés, avec les cinémas dans l'ordre de la configuration."""
+    order = {theater.name: i for i, theater in enumerate(theaters)}
+    movies = []
 
-        if movie.title not in data.keys():
-            data[movie.title] = {
+    for entry in data.values():
+        movie = entry["movie"]
+        movies.append(
+            {
                 "title": movie.title,
+                "original_title": movie.original_title,
                 "release_year": movie.release_year,
                 "duree": movie.runtime,
                 "rating": movie.rating,
@@ -64,43 +103,192 @@ def get_showtimes(theaters: list[Theater], date: datetime) -> list[dict]:
                 "director": movie.director,
                 "wantToSee": movie.wantToSee,
                 "url": movie.letterboxd_url,
-                "seances": {},
-            }
-
-        if theater.name not in data[movie.title]["seances"].keys():
-            data[movie.title]["seances"][theater.name] = []
-
-        data[movie.title]["seances"][theater.name].append(
-            {
-                "time": showtime.startsAt.strftime("%H:%M"),
-                "lang": showtime.language,
-                "format": showtime.format,
-                "ticketing_url": showtime.ticketing_url,
+                "tmdb_key": movie.tmdb_key,
+                "seances": dict(sorted(entry["seances"].items(), key=lambda item: order.get(item[0], len(order)))),
             }
         )
 
-    movies = list(data.values())
     movies = sorted(movies, key=lambda x: x["wantToSee"], reverse=True)
 
     return movies
 
 
+def unit_hash(showtimes: list[Showtime]) -> str:
+    """Empreinte du contenu d'une unité (cinéma, date), indépendante de l'ordre des pages.
+
+    Couvre les séances et les champs Allociné de leurs films (affiche, wantToSee, genres, durée...) : une
+    affiche apparue ou un nouveau compteur rend l'unité modifiée, et ses films sont réécrits. Les champs
+    TMDB, complétés après coup, n'en font pas partie."""
+    items = sorted(
+        (s.movie.title, s.startsAt.isoformat(), s.language, s.format or "", s.ticketing_url or "") for s in showtimes
+    )
+    films = sorted(
+        {
+            json.dumps([m.title, m.runtime, m.allocine_year, m.genres, m.wantToSee, m.affiche, m.director])
+            for m in (s.movie for s in showtimes)
+        }
+    )
+    body = json.dumps([items, films], ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def scrape_dates(
+    units: dict[datetime, list[Theater]],
+    on_day_done: Callable[[datetime, list[dict], dict[Theater, tuple[str, bool]]], None],
+    enricher: TmdbEnricher | None = None,
+    previous_hashes: dict[tuple[str, str], str] | None = None,
+):
+    """Récupère les séances des unités (cinéma, date) demandées via un pool de workers borné.
+
+    Chaque page d'une unité est une tâche : les pages suivantes sont planifiées dès que la première
+    page a donné le nombre total de pages. Le débit est borné par le limiteur Allociné de
+    `modules.Classes`. Une unité terminée dont l'empreinte est celle de `previous_hashes`
+    ((date, identifiant du cinéma) -> sha256) est ignorée ; seuls les films des unités modifiées sont
+    enrichis. Pour ces unités déjà connues, les pages inchangées dans le cache HTTP ne sont pas
+    analysées : si toutes le sont, l'unité est inchangée, sinon elles sont redemandées et analysées.
+
+    `on_day_done(date, films, unités)` est appelé dès qu'une date est complète, avec les films des
+    unités modifiées et, pour chaque cinéma récupéré, son empreinte et s'il a changé (les unités en
+    erreur sont absentes et seront retentées).
+    """
+    previous_hashes = previous_hashes or {}
+    days = {date: {"data": {}, "pending": 0, "fetched": {}} for date in units}
+    unit_states = {}
+    futures = {}
+
+    if enricher is None:
+        with TmdbEnricher() as enricher:
+            return scrape_dates(units, on_day_done, enricher, previous_hashes)
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+
+        def submit(theater: Theater, date: datetime, page: int):
+            unit = unit_states[theater, date]
+            days[date]["pending"] += 1
+            unit["pending"] += 1
+            future = executor.submit(theater.getShowtimesPage, date, page, unit["known"] and not unit["parsed"])
+            futures[future] = (theater, date, page)
+
+        # Les dates sont soumises dans l'ordre pour que les premières soient terminées (et sauvegardées) en premier
+        for date, theaters in units.items():
+            for theater in theaters:
+                known = (date.strftime("%Y-%m-%d"), theater.id) in previous_hashes
+                unit_states[theater, date] = {
+                    "showtimes": [], "pending": 0, "failed": False, "known": known, "parsed": 0, "skipped": [],
+                    "scheduled": False,
+                }
+                submit(theater, date, 1)
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                theater, date, page = futures.pop(future)
+                day = days[date]
+                unit = unit_states[theater, date]
+                day["pending"] -= 1
+                unit["pending"] -= 1
+
+                try:
+                    showtimes, total_pages = future.result()
+                except Exception as e:
+                    logger.error(f"Erreur pour {theater.name} ({date.strftime('%Y-%m-%d')}): {e}")
+                    metrics.increment("pages.failed")
+                    unit["failed"] = True
+                else:
+                    if showtimes is None:
+                        unit["skipped"].append(page)
+                    else:
+                        unit["parsed"] += 1
+                        unit["showtimes"].extend(showtimes)
+                    if page == 1 and not unit["scheduled"]:
+                        unit["scheduled"] = True
+                        for next_page in range(2, total_pages + 1):
+                            submit(theater, date, next_page)
+
+                if unit["pending"] == 0 and not unit["failed"] and unit["skipped"] and unit["parsed"]:
+                    # Une partie des pages a changé : les pages inchangées doivent aussi être analysées
+                    for skipped_page in unit["skipped"]:
+                        submit(theater, date, skipped_page)
+                    unit["skipped"] = []
+                elif unit["pending"] == 0 and not unit["failed"]:
+                    date_key = (date.strftime("%Y-%m-%d"), theater.id)
+                    sha256 = previous_hashes[date_key] if unit["skipped"] else unit_hash(unit["showtimes"])
+                    changed = previous_hashes.get(date_key) != sha256
+                    day["fetched"][theater] = (sha256, changed)
+                    metrics.increment("units.changed" if changed else "units.unchanged")
+                    if changed:
+                        aggregate_showtimes(day["data"], unit["showtimes"])
+                        for showtime in unit["showtimes"]:
+                            enricher.submit(showtime.movie)
+                    del unit_states[theater, date]
+
+                if day["pending"] == 0:
+                    with metrics.timer("tmdb.wait", date=date.strftime("%Y-%m-%d")):
+                        enricher.enrich(entry["movie"] for entry in day["data"].values())
+                    on_day_done(date, finalize_day(day["data"], units[date]), day["fetched"])
+
+
+def get_showtimes(theaters: list[Theater], date: datetime) -> list[dict]:
+    """Récupère les séances pour une date donnée (tous les cinémas en parallèle)."""
+    result = []
+    scrape_dates({date: theaters}, lambda _, movies, __: result.extend(movies))
+    return result
+
+
+def merge_day(previous: list[dict], fresh: list[dict], replaced: set[str], theaters: list[Theater]) -> list[dict]:
+    """Remplace dans une journée déjà sauvegardée les séances des cinémas rescrapés (`replaced`).
+
+    Les séances des autres cinémas sont conservées ; un film rescrapé reprend ses métadonnées fraîches.
+    Les cinémas qui ne sont plus configurés sont retirés."""
+    order = {theater.name: i for i, theater in enumerate(theaters)}
+    movies = {}
+
+    for movie in previous:
+        seances = {cinema: s for cinema, s in movie["seances"].items() if cinema in order and cinema not in replaced}
+        if seances:
+            movies[movie["title"]] = {**movie, "seances": seances}
+
+    for movie in fresh:
+        seances = movie["seances"]
+        if movie["title"] in movies:
+            seances = {**movies[movie["title"]]["seances"], **seances}
+        seances = dict(sorted(seances.items(), key=lambda item: order.get(item[0], len(order))))
+        movies[movie["title"]] = {**movie, "seances": seances}
+
+    return sorted(movies.values(), key=lambda x: x["wantToSee"], reverse=True)
+
+
 def load_existing_data() -> dict:
-    """Charge les données existantes si disponibles."""
-    if os.path.exists(OUTPUT_FILE):
-        try:
-            with open(OUTPUT_FILE, "r", encoding="utf-8") as f:
+    """Charge les données existantes si disponibles (data/, ou l'ancien movies.json)."""
+    try:
+        data = read_data(DATA_DIR)
+        if data is not None:
+            return data
+        if os.path.exists(LEGACY_OUTPUT_FILE):
+            with open(LEGACY_OUTPUT_FILE, "r", encoding="utf-8") as f:
                 return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            pass
+    except (json.JSONDecodeError, KeyError, IOError):
+        pass
     return {"generated_at": None, "days": []}
 
 
 def save_data(data: dict):
-    """Sauvegarde les données dans movies.json."""
-    data["generated_at"] = datetime.now().isoformat()
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """Sauvegarde les données dans data/ : seuls les fichiers modifiés sont réécrits."""
+    with metrics.timer("save"):
+        changed = write_data(data["days"], datetime.now().isoformat(), DATA_DIR)
+        data["generated_at"] = read_manifest(DATA_DIR)["generated_at"]
+    metrics.increment("save.files", len(changed))
+    if changed:
+        logger.info(f"   💾 {len(changed)} fichier(s) réécrit(s)")
+
+
+def save_snapshot(data: dict):
+    """Écrit l'instantané binaire une seule fois, en fin d'exécution (pas à chaque jour sauvegardé)."""
+    manifest = read_manifest(DATA_DIR)
+    if manifest is None:
+        return
+    with metrics.timer("save.snapshot"):
+        write_snapshot(data["days"], manifest["generated_at"], manifest_sources(manifest), DATA_DIR)
 
 
 def get_dates_to_scrape(existing_data: dict) -> list[str]:
@@ -137,53 +325,121 @@ def clean_old_dates(data: dict) -> dict:
     return data
 
 
-def check_missing_data(existing_data: dict) -> tuple[set[str], set[str]]:
-    """Vérifie si des films ont des données manquantes (affiche, synopsis).
-    Retourne les dates à rescraper et les titres de films à supprimer du cache TMDB."""
-    dates_with_missing_data = set()
-    films_to_clear_from_cache = set()
-
-    for day in existing_data.get("days", []):
-        date_str = day.get("date", "")
-        movies = day.get("movies", [])
-
-        for movie in movies:
-            title = movie.get("title", "Inconnu")
-            year = movie.get("release_year", "")
-
-            affiche = movie.get("affiche", "")
-            has_missing_data = False
-
-            if not affiche or affiche == "/static/images/nocontent.png":
-                logger.info(f"   📷 Affiche manquante pour '{title}' ({date_str})")
-                has_missing_data = True
+def plan_units(
+    theaters: list[Theater], existing_data: dict, freshness: dict, now: datetime
+) -> dict[datetime, list[Theater]]:
+    """Unités (cinéma, date) à récupérer, par date.
+
+    Tous les cinémas des dates manquantes, et pour les dates conservées les cinémas jamais récupérés
+    ou récupérés il y a plus de SCRAPE_MAX_AGE_HOURS heures."""
+    units = {}
+    for date_str in get_dates_to_scrape(existing_data):
+        units[datetime.strptime(date_str, "%Y-%m-%d")] = list(theaters)
+
+    max_age = timedelta(hours=SCRAPE_MAX_AGE_HOURS)
+    for day in existing_data["days"]:
+        stale = []
+        for theater in theaters:
+            entry = freshness.get(day["date"], {}).get(theater.id)
+            if entry is None or now - datetime.fromisoformat(entry["fetched_at"]) >= max_age:
+                stale.append(theater)
+        if stale:
+            units[datetime.strptime(day["date"], "%Y-%m-%d")] = stale
+
+    return dict(sorted(units.items()))
+
+
+def refresh_tmdb_data(days: list[dict], enricher: TmdbEnricher) -> int:
+    """Met à jour les données TMDB expirées des films déjà sauvegardés, sans rescraper leurs dates.
+
+    Seules les entrées expirées du cache (ou dont la note est à rafraîchir) déclenchent une requête.
+    Retourne le nombre de films modifiés."""
+    films = [film for day in days for film in day.get("movies", []) if film.get("tmdb_key")]
+
+    for film in films:
+        allocine_year = film["tmdb_key"].rsplit("|", 1)[-1]
+        enricher.submit_key(film["tmdb_key"], film["title"], allocine_year, film["director"])
+
+    updated = 0
+    for film in films:
+        tmdb_data = enricher.result(film["tmdb_key"])
+        refreshed = {
+            "original_title": tmdb_data["original_title"],
+            "release_year": tmdb_data["year"],
+            "rating": tmdb_data["rating"],
+            "synopsis": tmdb_data["synopsis"],
+            "url": letterboxd_url(tmdb_data["original_title"], tmdb_data["year"]),
+        }
+        if any(film.get(field) != value for field, value in refreshed.items()):
+            film.update(refreshed)
+            updated += 1
+
+    return updated
+
+
+def log_http_stats():
+    """Affiche les compteurs du transport HTTP (requêtes, retries, volume, latence) par hôte."""
+    for host, stats in transport.stats.snapshot().items():
+        logger.info(
+            f"🌐 {host}: {stats['requests']} requête(s), {stats['retries']} retry(s), "
+            f"{stats['throttled']} 429, {stats['errors']} erreur(s) réseau, {stats['bytes'] / 1024:.0f} Ko, "
+            f"latence moy. {stats['latency_avg'] * 1000:.0f} ms (max {stats['latency_max'] * 1000:.0f} ms)"
+        )
 
-            synopsis = movie.get("synopsis", "")
-            if not synopsis or synopsis == "Synopsis non disponible":
-                logger.info(f"   📝 Synopsis manquant pour '{title}' ({date_str})")
-                has_missing_data = True
 
-            if has_missing_data:
-                dates_with_missing_data.add(date_str)
-                films_to_clear_from_cache.add(f"{title}|{year}")
+def log_http_cache_stats():
+    """Affiche le bilan du cache des pages Allociné : pages inchangées, analyses évitées, volume économisé."""
+    stats = http_cache.report()
+    if not stats["requests"]:
+        return
+    logger.info(
+        f"🗄️ Cache HTTP: {stats['requests']} page(s), {stats['not_modified']} 304, "
+        f"{stats['unchanged']} inchangée(s), {stats['changed']} modifiée(s), {stats['new']} nouvelle(s) "
+        f"(taux de succès {stats['hit_rate']:.0%}), {stats['parse_skipped']} analyse(s) évitée(s), "
+        f"{stats['bytes_saved'] / 1024:.0f} Ko non téléchargés"
+    )
+
+
+def write_metrics(path: str, trace_path: str):
+    """Écrit le résumé JSON des métriques (et la trace) et affiche les étapes et cinémas les plus longs."""
+    summary = metrics.summary(http=transport.stats.snapshot(), http_cache=http_cache.report())
+    stages = sorted(summary["stages"].items(), key=lambda item: -item[1]["total_s"])[:6]
+    if stages:
+        logger.info(
+            f"📈 Durées cumulées ({summary['duration_s']:.1f} s au total): "
+            + ", ".join(f"{stage} {timing['total_s']:.1f} s ({timing['count']})" for stage, timing in stages)
+        )
+    slowest = list(summary["by_theater"].items())[:3]
+    if slowest:
+        logger.info("🐢 Cinémas les plus longs: " + ", ".join(f"{name} {t['total_s']:.1f} s" for name, t in slowest))
 
-    return dates_with_missing_data, films_to_clear_from_cache
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        logger.info(f"📈 Métriques écrites dans {path}")
+    if trace_path:
+        events = metrics.write_trace(trace_path)
+        logger.info(f"🧵 Trace écrite dans {trace_path} ({events} évènement(s))")
 
 
-def main():
-    # Parser d'arguments
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Script de scraping des séances de cinéma")
     parser.add_argument("--force", action="store_true", help="Forcer le rescraping complet de toutes les dates")
     parser.add_argument("--clear-cache", action="store_true", help="Vider le cache TMDB avant le scraping")
-    args = parser.parse_args()
+    parser.add_argument("--metrics", default=METRICS_FILE, help="Fichier du résumé JSON des métriques (vide = aucun)")
+    parser.add_argument("--trace", default=TRACE_FILE, help="Fichier de trace détaillée (Chrome Trace Event)")
+    return parser.parse_args(argv)
+
+
+def main(args: argparse.Namespace | None = None):
+    args = args or parse_args()
 
     logger.info("🎬 Démarrage du scraping des séances de cinéma...")
 
     # Vider le cache TMDB si demandé
     if args.clear_cache:
-        if os.path.exists(TMDB_CACHE_FILE):
-            os.remove(TMDB_CACHE_FILE)
-            logger.info("🗑️ Cache TMDB supprimé")
+        clear_tmdb_cache()
+        logger.info("🗑️ Cache TMDB supprimé")
 
     theaters_config = json.loads(THEATERS_JSON)
 
@@ -213,92 +469,100 @@ def main():
     # Charger les données existantes (sauf si --force)
     if args.force:
         existing_data = {"generated_at": None, "days": []}
+        freshness = {}
         logger.info("🔄 Mode force activé - rescraping complet")
     else:
-        existing_data = load_existing_data()
-        existing_data = clean_old_dates(existing_data)
-
-    # Déterminer les dates à scraper
-    dates_to_scrape = set(get_dates_to_scrape(existing_data))
-
-    # Vérifier les données manquantes
-    if not args.force:
-        logger.info("🔍 Vérification des données manquantes...")
-        dates_with_missing, films_to_clear = check_missing_data(existing_data)
-        if dates_with_missing:
-            logger.info(f"   ⚠️ {len(dates_with_missing)} date(s) avec données manquantes")
-            logger.info(f"   🗑️ {len(films_to_clear)} film(s) à supprimer du cache TMDB")
-
-            titles_to_clear = {key.split("|")[0] for key in films_to_clear}
-
-            if os.path.exists(TMDB_CACHE_FILE):
-                try:
-                    with open(TMDB_CACHE_FILE, "r", encoding="utf-8") as f:
-                        tmdb_cache = json.load(f)
-
-                    keys_to_delete = []
-                    for cache_key in tmdb_cache.keys():
-                        cache_title = cache_key.split("|")[0]
-                        if cache_title in titles_to_clear:
-                            keys_to_delete.append(cache_key)
-
-                    for key in keys_to_delete:
-                        del tmdb_cache[key]
-                        logger.info(f"      🧹 Cache supprimé pour: {key.split('|')[0]}")
-
-                    with open(TMDB_CACHE_FILE, "w", encoding="utf-8") as f:
-                        json.dump(tmdb_cache, f, ensure_ascii=False, indent=2)
-                except Exception as e:
-                    logger.warning(f"   ⚠️ Erreur nettoyage cache: {e}")
-
-            dates_to_scrape.update(dates_with_missing)
-            existing_data["days"] = [day for day in existing_data.get("days", [])
-                                      if day.get("date") not in dates_with_missing]
-
-    dates_to_scrape = sorted(list(dates_to_scrape))
-
-    if not dates_to_scrape:
-        logger.info("✅ Toutes les données sont à jour, aucun scraping nécessaire.")
-        logger.info("   Utilisez --force pour forcer le rescraping")
-        save_data(existing_data)
-        return
-
-    logger.info(f"📅 {len(dates_to_scrape)} jour(s) à scraper (données existantes conservées)")
+        with metrics.timer("load"):
+            existing_data = load_existing_data()
+            existing_data = clean_old_dates(existing_data)
+            kept_dates = {day["date"] for day in existing_data["days"]}
+            freshness = {date: units for date, units in read_freshness(DATA_DIR).items() if date in kept_dates}
+
+    # Déterminer les unités (cinéma, date) à scraper : dates manquantes et cinémas trop anciens
+    now = datetime.now()
+    units = plan_units(theaters, existing_data, freshness, now)
+    previous_hashes = {
+        (date, theater_id): entry["sha256"]
+        for date, entries in freshness.items()
+        for theater_id, entry in entries.items()
+    }
+
+    with TmdbEnricher() as enricher:
+        # Rafraîchir les données TMDB expirées des jours conservés (échecs et notes inconnues retentés avec backoff)
+        if existing_data["days"]:
+            logger.info("🔍 Rafraîchissement des données TMDB expirées...")
+            with metrics.timer("tmdb.refresh"):
+                updated = refresh_tmdb_data(existing_data["days"], enricher)
+            logger.info(f"   ✅ {updated} film(s) mis à jour")
+
+        if not units:
+            logger.info("✅ Toutes les données sont à jour, aucun scraping nécessaire.")
+            logger.info("   Utilisez --force pour forcer le rescraping")
+            save_data(existing_data)
+            save_snapshot(existing_data)
+            return
 
-    # Créer un dictionnaire des jours existants pour accès rapide
-    existing_days = {day["date"]: day for day in existing_data.get("days", [])}
+        total_units = sum(len(unit_theaters) for unit_theaters in units.values())
+        logger.info(
+            f"📅 {total_units} unité(s) (cinéma, date) à scraper sur {len(units)} jour(s) "
+            f"(sur {len(theaters) * DAYS_TO_SCRAPE}, données existantes conservées)"
+        )
 
-    for date_str in dates_to_scrape:
-        date = datetime.strptime(date_str, "%Y-%m-%d")
+        # Créer un dictionnaire des jours existants pour accès rapide
+        existing_days = {day["date"]: day for day in existing_data.get("days", [])}
 
-        logger.info(f"📅 Récupération des séances pour {date_str}...")
+        def on_day_done(date: datetime, movies: list[dict], fetched: dict[Theater, tuple[str, bool]]):
+            date_str = date.strftime("%Y-%m-%d")
+            replaced = {theater.name for theater, (_, changed) in fetched.items() if changed}
 
-        try:
-            movies = get_showtimes(theaters, date)
+            if date_str not in existing_days or replaced:
+                previous = existing_days.get(date_str, {"movies": []})["movies"]
+                existing_days[date_str] = {"date": date_str, "movies": merge_day(previous, movies, replaced, theaters)}
 
-            existing_days[date_str] = {"date": date_str, "movies": movies}
+            for theater, (sha256, _) in fetched.items():
+                freshness.setdefault(date_str, {})[theater.id] = {"fetched_at": now.isoformat(), "sha256": sha256}
 
-            logger.info(f"   ✅ {len(movies)} film(s) récupéré(s)")
+            logger.info(
+                f"   ✅ {date_str}: {len(fetched)} cinéma(s) récupéré(s), {len(replaced)} modifié(s), "
+                f"{len(existing_days[date_str]['movies'])} film(s)"
+            )
 
             # Sauvegarder après chaque jour pour pouvoir reprendre en cas d'échec
             existing_data["days"] = sorted(existing_days.values(), key=lambda x: x["date"])
             save_data(existing_data)
+            write_freshness(freshness, DATA_DIR)
+            flush_tmdb_cache()
 
-            # Petit délai pour éviter le rate limiting
-            time.sleep(1)
+        logger.info(f"📅 Récupération des séances ({len(theaters)} cinéma(s), {MAX_WORKERS} workers)...")
 
+        try:
+            with metrics.timer("scrape"):
+                scrape_dates(units, on_day_done, enricher, previous_hashes)
         except Exception as e:
-            logger.error(f"❌ Erreur pour {date_str}: {e}")
+            logger.error(f"❌ Erreur pendant le scraping: {e}")
             logger.warning("💾 Progrès sauvegardé. Relancez le script pour continuer.")
             # Sauvegarder le progrès avant de quitter
             existing_data["days"] = sorted(existing_days.values(), key=lambda x: x["date"])
             save_data(existing_data)
+            write_freshness(freshness, DATA_DIR)
             raise
 
-    logger.info(f"✅ Scraping terminé et sauvegardé dans {OUTPUT_FILE}")
+    save_snapshot(existing_data)
+    logger.info(f"✅ Scraping terminé et sauvegardé dans {DATA_DIR}/")
     total_movies = sum(len(day["movies"]) for day in existing_data["days"])
     logger.info(f"📊 Total: {total_movies} entrées de films sur {len(existing_data['days'])} jours")
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.trace:
+        metrics.enable_trace()
+    try:
+        main(args)
+    finally:
+        # Compacter le cache TMDB (instantané réécrit atomiquement, journal supprimé)
+        close_tmdb_cache()
+        http_cache.prune()
+        log_http_stats()
+        log_http_cache_stats()
+        write_metrics(args.metrics, args.trace)
@@ -1,10 +1,52 @@
+import threading
+from datetime import date, datetime, time, timedelta
+from time import sleep
+from types import SimpleNamespace
+
 import pytest
+from flask import Flask
 
-from app import app
+import app as app_module
+import modules.Classes
+import modules.Profiling
+from app import app, build_days, build_snapshot, data_watcher
+from modules.Classes import (
+    HttpCache,
+    Movie,
+    Showtime,
+    TmdbEnricher,
+    Transport,
+    close_tmdb_cache,
+    get_tmdb_details,
+    load_tmdb_cache,
+    set_tmdb_cache,
+    stamp_tmdb_entry,
+    tmdb_cache_status,
+)
+from modules.Geo import GeoIndex
+from modules.Metrics import Metrics
+from modules.Profiling import RequestProfiler
+from modules.Search import SearchIndex
+from modules.Storage import SNAPSHOT_FILE, read_data, read_manifest, read_snapshot, write_data
+from modules.Watcher import SnapshotWatcher
+from scrape import merge_day, scrape_dates, unit_hash
 
 
 @pytest.fixture
-def client():
+def client(monkeypatch):
+    # data/ peut dater de plusieurs mois : la date du jour est fixée au premier jour des données
+    manifest = read_manifest()
+    if manifest and manifest['days']:
+        first_day = date.fromisoformat(manifest['days'][0]['date'])
+
+        class FrozenDate(date):
+            @classmethod
+            def today(cls):
+                return first_day
+
+        monkeypatch.setattr('app.date', FrozenDate)
+        data_watcher.refresh()
+
     app.config['TESTING'] = True
     with app.test_client() as client:
         yield client
@@ -17,7 +59,525 @@ def test_health_check(client):
 
 def test_home_page(client):
     """Test que la page d'accueil charge sans erreur 500."""
-    # Note: Cela peut echouer si movies.json est manquant ou corrompu,
-    # mais load_movies_data gère le cas de fichier manquant.
+    # Note: Cela peut echouer si data/ est manquant ou corrompu,
+    # mais load_movies_data gère le cas du manifeste manquant.
     rv = client.get('/')
     assert rv.status_code == 200
+
+def test_home_page_delta(client):
+    """Test que la vue d'un jour (et un delta hors limites) charge sans erreur."""
+    for delta in ("0", "1", "99", "-3"):
+        rv = client.get(f'/?delta={delta}')
+        assert rv.status_code == 200
+
+def test_home_page_conditional(client):
+    """Test que la page d'accueil renvoie un ETag et répond 304 si elle n'a pas changé."""
+    rv = client.get('/?delta=0', headers={'Accept-Encoding': 'gzip'})
+    assert rv.status_code == 200
+    assert rv.headers['Content-Encoding'] == 'gzip'
+    etag = rv.headers['ETag']
+
+    rv = client.get('/?delta=0', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert rv.status_code == 304
+
+def test_api_films_pagination(client):
+    """Test que /api/films pagine sans doublon et que /api/showtimes rejette un filtre invalide."""
+    seen = []
+    cursor = None
+    while True:
+        rv = client.get('/api/films', query_string={'limit': 5, 'cursor': cursor or ''})
+        assert rv.status_code == 200
+        seen.extend(film['id'] for film in rv.json['films'])
+        cursor = rv.json['next_cursor']
+        if not cursor:
+            break
+    assert len(seen) == len(set(seen))
+
+    rv = client.get('/api/showtimes?from=25:00')
+    assert rv.status_code == 400
+
+def test_seances_fragment(client):
+    """Test que le fragment de séances d'un jour répond et qu'un jour inconnu renvoie 404."""
+    rv = client.get('/api/showtimes', query_string={'limit': 1})
+    assert rv.status_code == 200
+    for showtime in rv.json['showtimes']:
+        rv = client.get('/fragments/seances', query_string={'day': showtime['date'], 'film': showtime['title']})
+        assert rv.status_code == 200
+        assert b'seance_container' in rv.data
+
+    rv = client.get('/fragments/seances?day=1999-01-01&film=x')
+    assert rv.status_code == 404
+
+def test_snapshot_matches_json():
+    """Test que l'instantané binaire, s'il est à jour, contient les mêmes séances que les fichiers JSON."""
+    manifest = read_manifest()
+    snapshot = read_snapshot(manifest) if manifest else None
+    if snapshot is None:
+        pytest.skip("pas d'instantané à jour")
+    assert snapshot['days'] == read_data()['days']
+
+def test_snapshot_written_lazily(tmp_path, monkeypatch):
+    """Test que l'instantané n'est plus écrit avec les données, mais au premier chargement s'il manque."""
+    data = read_data()
+    if not data or not data['days']:
+        pytest.skip("pas de données dans data/")
+    write_data(data['days'][:2], data['generated_at'], str(tmp_path))
+    assert not (tmp_path / SNAPSHOT_FILE).exists()
+
+    monkeypatch.setattr('app.DATA_PATH', str(tmp_path))
+    build_snapshot(None, (1.0, date.fromisoformat(data['days'][0]['date'])), False)
+    snapshot = read_snapshot(read_manifest(str(tmp_path)), str(tmp_path))
+    assert snapshot is not None and snapshot['days'] == data['days'][:2]
+
+    # Dossier en lecture seule (Vercel) : l'instantané n'est même pas construit
+    (tmp_path / SNAPSHOT_FILE).unlink()
+    monkeypatch.setattr('app.os.access', lambda path, mode: False)
+    monkeypatch.setattr('app.write_snapshot', lambda *args: pytest.fail("instantané construit"))
+    build_snapshot(None, (2.0, date.fromisoformat(data['days'][0]['date'])), False)
+
+def test_write_data_rewrites_changed_shards(tmp_path):
+    """Test que l'écriture des données ne réécrit que les fichiers modifiés et supprime les jours disparus."""
+    def day(date_str, title, seances):
+        return {"date": date_str, "movies": [{"title": title, "duree": "1h30", "seances": seances}]}
+
+    days = [day("2026-10-17", "Film A", {"Cinéma": ["14:00"]}), day("2026-10-18", "Film A", {"Cinéma": ["16:00"]})]
+    written = write_data(days, "t1", str(tmp_path))
+    assert sorted(written) == ["days/2026-10-17.json", "days/2026-10-18.json", "films.json"]
+    assert write_data(days, "t2", str(tmp_path)) == []
+    assert read_manifest(str(tmp_path))["generated_at"] == "t1"
+
+    # Séances modifiées un seul jour : seul ce fichier de jour est réécrit
+    days[1] = day("2026-10-18", "Film A", {"Cinéma": ["18:00"]})
+    assert write_data(days, "t3", str(tmp_path)) == ["days/2026-10-18.json"]
+    assert read_manifest(str(tmp_path))["generated_at"] == "t3"
+
+    # Jour passé retiré : son fichier est supprimé, le manifeste ne le référence plus
+    assert write_data(days[1:], "t4", str(tmp_path)) == ["days/2026-10-17.json"]
+    assert not (tmp_path / "days" / "2026-10-17.json").exists()
+    assert [entry["date"] for entry in read_manifest(str(tmp_path))["days"]] == ["2026-10-18"]
+    assert read_data(str(tmp_path))["days"] == days[1:]
+
+def test_metrics_summary():
+    """Test que le résumé des métriques agrège les durées par étape, par cinéma et par date."""
+    metrics = Metrics()
+    metrics.enable_trace()
+    metrics.record('fetch', 0.2, theater='A', date='2026-10-17')
+    metrics.record('fetch', 0.1, theater='B', date='2026-10-17')
+    with metrics.timer('parse', theater='B'):
+        pass
+    metrics.increment('tmdb.cache.fresh', 3)
+
+    summary = metrics.summary()
+    assert summary['stages']['fetch']['count'] == 2
+    assert list(summary['by_theater']) == ['A', 'B']
+    assert summary['by_date']['2026-10-17']['fetch']['count'] == 2
+    assert summary['counters'] == {'tmdb.cache.fresh': 3}
+    assert len(metrics._trace) == 3
+
+def test_server_timing(monkeypatch):
+    """Test l'en-tête Server-Timing et la protection de /metrics par jeton."""
+    monkeypatch.setattr(modules.Profiling, 'METRICS_TOKEN', 'secret')
+    demo = Flask(__name__)
+    profiler = RequestProfiler(enabled=True)
+
+    @demo.route('/')
+    def index():
+        with profiler.phase('render'):
+            return 'ok'
+
+    profiler.init_app(demo)
+    client = demo.test_client()
+    rv = client.get('/')
+    assert rv.headers['Server-Timing'].startswith('render;dur=')
+    assert 'total;dur=' in rv.headers['Server-Timing']
+
+    assert client.get('/metrics').status_code == 401
+    rv = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert rv.json['histograms']['index']['count'] == 1
+
+def test_profiler_sampling(monkeypatch):
+    """Test qu'une requête échantillonnée ne peut pas échouer si un autre profil est déjà actif."""
+    demo = Flask(__name__)
+    profiler = RequestProfiler(enabled=True)
+    profiler.sample_rate, profiler.slow_ms = 1.0, float('inf')
+    demo.add_url_rule('/', 'index', lambda: 'ok')
+    profiler.init_app(demo)
+    client = demo.test_client()
+
+    assert client.get('/').status_code == 200
+    with profiler._profile_lock:
+        assert client.get('/').status_code == 200
+
+    class BusyProfile:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(modules.Profiling.cProfile, 'Profile', BusyProfile)
+    assert client.get('/').status_code == 200
+    assert not profiler._profile_lock.locked()
+
+def test_snapshot_watcher():
+    """Test la publication d'un nouvel instantané au changement de version et l'anti-rebond des rechargements."""
+    version = [1]
+    builds = []
+
+    def build(previous, current, force):
+        builds.append((current, force))
+        return {"version": current}
+
+    watcher = SnapshotWatcher(lambda: version[0], build, interval=0, debounce=60)
+    assert watcher.refresh() and watcher.current == {"version": 1}
+    assert not watcher.refresh()
+
+    version[0] = 2
+    first = watcher.current
+    assert watcher.refresh() and watcher.current == {"version": 2}
+    assert first == {"version": 1}
+
+    assert watcher.reload() == "reloaded"
+    assert watcher.reload() == "debounced"
+    assert builds == [(1, False), (2, False), (2, True)]
+
+def test_reload_requires_token(client, monkeypatch):
+    """Test que /reload est désactivé sans jeton et refuse un jeton invalide."""
+    assert client.get('/reload').status_code == 404
+    monkeypatch.setattr('app.RELOAD_TOKEN', 'secret')
+    assert client.get('/reload', headers={'Authorization': 'Bearer x'}).status_code == 401
+
+def test_midnight_rollover():
+    """Test qu'au passage à minuit les jours passés sont retirés et les vues par date conservées."""
+    data = read_data()
+    if not data or len(data['days']) < 2:
+        pytest.skip("pas assez de jours dans data/")
+    days = {date.fromisoformat(day['date']): day['movies'] for day in data['days']}
+    first, second = sorted(days)[:2]
+
+    before = build_days(days, first, 1.0)
+    after = build_days(before['days'], first + timedelta(1), 1.0, before['views'], before['catalog'].state())
+    assert first not in after['days'] and first not in after['views']
+    assert after['views'][second] is before['views'][second]
+    assert after['dates'][0]['iso'] == second.isoformat() and after['dates'][0]['index'] == 0
+    assert after['catalog'].dates[0] == second
+
+def test_geo_index():
+    """Test la recherche des cinémas dans un rayon, triés par distance."""
+    index = GeoIndex([
+        {"name": "Bellecour", "latitude": 45.7578, "longitude": 4.8320},
+        {"name": "Part-Dieu", "latitude": 45.7606, "longitude": 4.8592},
+        {"name": "Villeurbanne", "latitude": 45.7667, "longitude": 4.8800},
+        {"name": "Grenoble", "latitude": 45.1885, "longitude": 5.7245},
+        {"name": "Sans coordonnées", "latitude": None, "longitude": None},
+    ])
+    names = [theater["name"] for _, theater in index.nearby(45.7600, 4.8350, 5)]
+    assert names == ["Bellecour", "Part-Dieu", "Villeurbanne"]
+    distance, theater = index.nearby(45.7600, 4.8350, 100)[-1]
+    assert theater["name"] == "Grenoble" and 90 < distance < 100
+
+def test_search_index():
+    """Test la recherche insensible aux accents, par préfixe et avec faute de frappe."""
+    films = [
+        {"id": 0, "title": "Le Fabuleux Destin d'Amélie Poulain", "original_title": None,
+         "director": "Jean-Pierre Jeunet", "genres": ["Comédie", "Romance"],
+         "synopsis": "Amélie, une jeune serveuse de Montmartre..."},
+        {"id": 1, "title": "Avatar : de Feu et de Cendres", "original_title": "Avatar: Fire and Ash",
+         "director": "James Cameron", "genres": ["Science Fiction"],
+         "synopsis": "Jake et Neytiri affrontent leur chagrin."},
+    ]
+    index = SearchIndex(films)
+    assert [film_id for film_id, _ in index.search("AMELIE")] == [0]
+    assert [film_id for film_id, _ in index.search("fire ash")] == [1]
+    assert [film_id for film_id, _ in index.search("jeun")] == [0]
+    assert [film_id for film_id, _ in index.search("camron")] == [1]
+    assert index.search("amélie cameron") == []
+    assert SearchIndex.from_state(index.state()).search("avtar") == index.search("avtar")
+
+def test_api_search(client):
+    """Test que /api/search renvoie des films notés et exige le paramètre q."""
+    title = client.get('/api/films', query_string={'limit': 1}).json['films'][0]['title']
+    rv = client.get('/api/search', query_string={'q': title.upper()})
+    assert rv.status_code == 200
+    assert rv.json['films'][0]['title'] == title
+    assert client.get('/api/search?q=').status_code == 400
+
+def test_api_nearby(client, monkeypatch):
+    """Test que /api/nearby trie les séances par distance et rejette des coordonnées invalides."""
+    cinemas = client.get('/api/showtimes', query_string={'limit': 200}).json['showtimes']
+    names = list(dict.fromkeys(showtime['cinema'] for showtime in cinemas))[:3]
+    theaters = [{"name": name, "latitude": 45.76 + i * 0.01, "longitude": 4.83} for i, name in enumerate(names)]
+    monkeypatch.setattr('app.theater_index', GeoIndex(theaters))
+
+    rv = client.get('/api/nearby', query_string={'lat': 45.76, 'lon': 4.83, 'radius': 10, 'from': '00:00'})
+    assert rv.status_code == 200
+    assert [cinema['name'] for cinema in rv.json['cinemas']] == names
+    distances = [showtime['distance_km'] for showtime in rv.json['showtimes']]
+    assert distances == sorted(distances)
+
+    assert client.get('/api/nearby?lat=45.76').status_code == 400
+    assert client.get('/api/nearby?lat=91&lon=4.83').status_code == 400
+    rv = client.get('/api/nearby?lat=45.76&lon=4.83&radius=abc')
+    assert rv.status_code == 400 and rv.json['error'] == 'paramètre radius invalide'
+
+def test_starting_between():
+    """Test que la fenêtre horaire des frises donne les mêmes séances qu'un filtrage complet."""
+    data = read_data()
+    if not data or not data['days']:
+        pytest.skip("pas de données dans data/")
+    days = {date.fromisoformat(day['date']): day['movies'] for day in data['days']}
+    catalog = build_days(days, min(days), 1.0)['catalog']
+    day, minutes, _, cinema_id, lang, _, _ = catalog.rows[len(catalog.rows) // 2]
+    for filters in ({}, {"cinema": catalog.cinemas[cinema_id].lower()}, {"lang": lang.upper()}):
+        expected = [
+            row_id for row_id, row in enumerate(catalog.rows)
+            if row[0] == day and minutes - 60 <= row[1] <= minutes + 60
+            and ("cinema" not in filters or catalog.cinemas[row[3]].lower() == filters["cinema"])
+            and ("lang" not in filters or row[4].upper() == filters["lang"])
+        ]
+        assert catalog.starting_between(day, minutes - 60, minutes + 60, filters) == expected
+
+def test_api_soon(client, monkeypatch):
+    """Test que /api/soon renvoie les prochaines séances dans l'ordre et que la section « Bientôt » suit."""
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.combine(app_module.date.today(), time(20, 0))
+
+    monkeypatch.setattr('app.datetime', FrozenDatetime)
+    rv = client.get('/api/soon', query_string={'within': 240})
+    assert rv.status_code == 200
+    starts_in = [showtime['starts_in'] for showtime in rv.json['showtimes']]
+    assert starts_in == sorted(starts_in) and all(0 <= minutes <= 240 for minutes in starts_in)
+    assert client.get('/fragments/bientot').status_code == (200 if starts_in else 204)
+    assert client.get('/api/soon?lat=91&lon=4.83').status_code == 400
+
+def test_http_cache_keeps_validators(tmp_path):
+    """Test qu'une page revalidée (304) puis stockée garde ses validateurs pour la requête suivante."""
+    class FakeTransport:
+        def __init__(self):
+            self.sent = []
+
+        def get(self, url, params=None, timeout=None, headers=None, **kwargs):
+            self.sent.append(headers or {})
+            if headers:
+                return SimpleNamespace(status_code=304, content=b'', headers={})
+            return SimpleNamespace(status_code=200, content=b'<html/>', headers={'ETag': '"v1"'})
+
+    fake = FakeTransport()
+    cache = HttpCache(str(tmp_path), fake)
+    cache.store(cache.fetch('https://example.org/page'), {'pages': 1})
+    page = cache.fetch('https://example.org/page')
+    assert page.unchanged and page.info == {'pages': 1}
+    cache.store(page, page.info)
+    cache.fetch('https://example.org/page')
+    assert fake.sent[1:] == [{'If-None-Match': '"v1"'}] * 2
+
+def test_transport_retry_after(monkeypatch):
+    """Test qu'un 429 est retenté après le délai Retry-After, puis que la réponse 200 est renvoyée."""
+    responses = [
+        SimpleNamespace(status_code=429, content=b'', headers={'Retry-After': '3'}),
+        SimpleNamespace(status_code=200, content=b'{}', headers={}),
+    ]
+    session = SimpleNamespace(get=lambda url, **kwargs: responses.pop(0))
+    waits = []
+    monkeypatch.setattr(modules.Classes.time, 'sleep', waits.append)
+
+    transport = Transport(max_retries=2)
+    monkeypatch.setattr(transport, 'session', lambda host: session)
+    response = transport.get('https://example.org/api')
+    assert response.status_code == 200
+    assert waits == [3.0]
+    assert transport.stats.snapshot()['example.org']['retries'] == 1
+
+def test_tmdb_cache_expiry():
+    """Test l'expiration d'une fiche TMDB et le backoff d'un film introuvable, qui garde l'ancienne fiche."""
+    found = {"year": "2025", "rating": "7.4", "synopsis": "Pandora...", "original_title": "Avatar", "tmdb_id": 1}
+    missing = {"year": "inconnue", "rating": "Note inconnue", "synopsis": "Synopsis non disponible",
+               "original_title": "Inconnu", "tmdb_id": None}
+
+    entry = stamp_tmdb_entry("Avatar|2025", found, now=1000)
+    assert tmdb_cache_status(entry, now=1001) == "fresh"
+    assert tmdb_cache_status(entry, now=entry["rating_expires_at"]) == "rating"
+    assert tmdb_cache_status(entry, now=entry["expires_at"]) == "expired"
+
+    first = stamp_tmdb_entry("Inconnu|", missing, now=1000)
+    second = stamp_tmdb_entry("Inconnu|", missing, first, now=first["expires_at"])
+    assert second["misses"] == 2
+    assert second["expires_at"] - first["expires_at"] == 2 * (first["expires_at"] - 1000)
+    assert tmdb_cache_status(second, now=second["expires_at"] - 1) == "fresh"
+    assert tmdb_cache_status(second, now=second["expires_at"]) == "expired"
+
+    failed = stamp_tmdb_entry("Avatar|2025", missing, entry, now=entry["expires_at"])
+    assert failed["synopsis"] == "Pandora..." and failed["misses"] == 1
+
+def test_tmdb_cache_log_replay(tmp_path, monkeypatch):
+    """Test le rejeu du journal TMDB (ligne finale tronquée ignorée) puis sa compaction."""
+    snapshot_file, log_file = tmp_path / "tmdb_cache.json", tmp_path / "tmdb_cache.log.jsonl"
+    monkeypatch.setattr(modules.Classes, "TMDB_CACHE_FILE", str(snapshot_file))
+    monkeypatch.setattr(modules.Classes, "TMDB_CACHE_LOG", str(log_file))
+    monkeypatch.setattr(modules.Classes, "_tmdb_cache", modules.Classes._tmdb_cache)  # Restauré après le test
+
+    snapshot_file.write_text('{"a": {"rating": "6.0"}, "b": {"rating": "7.0"}}', encoding="utf-8")
+    log_file.write_text(
+        '{"key": "a", "value": null}\n{"key": "c", "value": {"rating": "8.0"}}\n{"key": "b", "val', encoding="utf-8"
+    )
+    load_tmdb_cache()
+    assert modules.Classes._tmdb_cache == {"b": {"rating": "7.0"}, "c": {"rating": "8.0"}}
+    assert not log_file.exists()  # Compacté dès la ligne tronquée
+
+    # Écritures d'une exécution suivante derrière une ligne tronquée (arrêt brutal avant la compaction)
+    log_file.write_text('{"key": "d", "va\n{"key": "e", "value": {"rating": "5.0"}}\n', encoding="utf-8")
+    load_tmdb_cache()
+    assert modules.Classes._tmdb_cache["e"] == {"rating": "5.0"}
+
+    set_tmdb_cache("f", {"rating": "9.0"})
+    close_tmdb_cache()
+    assert not log_file.exists()
+    load_tmdb_cache()
+    assert sorted(modules.Classes._tmdb_cache) == ["b", "c", "e", "f"]
+
+def test_merge_day_keeps_failed_theaters():
+    """Test que la fusion d'un jour remplace les cinémas rescrapés et garde les séances des cinémas en erreur."""
+    theaters = [SimpleNamespace(name="A"), SimpleNamespace(name="B")]
+    previous = [
+        {"title": "Avatar", "wantToSee": 5, "seances": {"A": [{"time": "10:00"}], "B": [{"time": "11:00"}]}},
+        {"title": "Retiré", "wantToSee": 9, "seances": {"A": [{"time": "12:00"}]}},
+    ]
+    fresh = [{"title": "Avatar", "wantToSee": 6, "seances": {"A": [{"time": "20:00"}]}}]
+
+    merged = merge_day(previous, fresh, {"A"}, theaters)
+    assert merged == [
+        {"title": "Avatar", "wantToSee": 6, "seances": {"A": [{"time": "20:00"}], "B": [{"time": "11:00"}]}},
+    ]
+
+def test_scrape_dates_units():
+    """Test qu'une unité inchangée est ignorée, qu'une unité en partie modifiée est réanalysée en entier
+    et qu'une unité en erreur est absente (donc retentée)."""
+    class FakeTheater:
+        def __init__(self, name, pages):
+            self.name = self.id = name
+            self.pages = pages  # (page, skip_unchanged) -> séances (None : page inchangée) ou exception
+
+        def getShowtimesPage(self, date, page=1, skip_unchanged=False):
+            result = self.pages[page, skip_unchanged]
+            if isinstance(result, Exception):
+                raise result
+            return result, 2
+
+    unchanged = FakeTheater("A", {(1, True): None, (2, True): None})
+    partial = FakeTheater("C", {(1, True): None, (2, True): [], (1, False): []})
+    failed = FakeTheater("B", {(1, False): ConnectionError("timeout")})
+    day = datetime(2026, 10, 17)
+    days = []
+    enricher = SimpleNamespace(submit=lambda movie: None, enrich=lambda movies: list(movies))
+
+    previous_hashes = {("2026-10-17", "A"): "a" * 64, ("2026-10-17", "C"): "c" * 64}
+    scrape_dates({day: [unchanged, failed, partial]}, lambda *args: days.append(args), enricher, previous_hashes)
+    [(_, movies, fetched)] = days
+    assert movies == []
+    assert fetched[unchanged] == ("a" * 64, False)
+    assert fetched[partial] == (unit_hash([]), True)
+    assert failed not in fetched
+
+def test_refresh_rating_reuses_details(monkeypatch):
+    """Test que le rafraîchissement d'une note réutilise les détails TMDB déjà récupérés pendant l'exécution."""
+    requests_sent = []
+
+    def fake_request(url, params):
+        requests_sent.append(url)
+        return {"vote_average": 7.46, "overview": "..."}
+
+    monkeypatch.setattr(modules.Classes, "tmdb_request", fake_request)
+    monkeypatch.setattr(modules.Classes, "set_tmdb_cache", lambda key, value: None)
+    monkeypatch.setattr(modules.Classes, "_tmdb_details", {})
+    get_tmdb_details(42).result()
+
+    entry = {"rating": "6.0", "tmdb_id": 42, "rating_misses": 0}
+    refreshed = TmdbEnricher._refresh_rating("Film|2025", entry)
+    assert refreshed["rating"] == "7.5"
+    assert len(requests_sent) == 1
+
+def test_tmdb_enricher_resolves_each_key_once(monkeypatch):
+    """Test que l'enrichisseur TMDB ne résout qu'une fois par exécution chaque clé (titre, année)."""
+    lookups = []
+
+    def fake_fetch(title, allocine_year, director):
+        lookups.append((title, allocine_year))
+        sleep(0.01)
+        return {"year": "2025", "rating": "7.0", "synopsis": "...", "original_title": title, "tmdb_id": 1}
+
+    monkeypatch.setattr(modules.Classes, "fetch_tmdb_data", fake_fetch)
+    monkeypatch.setattr(modules.Classes, "get_tmdb_cache", lambda key: None)
+    monkeypatch.setattr(modules.Classes, "set_tmdb_cache", lambda key, value: None)
+
+    with TmdbEnricher(max_workers=4) as enricher:
+        futures = [enricher.submit_key("Film|2025", "Film", "2025", "") for _ in range(5)]
+        futures.append(enricher.submit_key("Autre|", "Autre", "", ""))
+        futures.append(enricher.submit_key("Film|2025", "Film", "2025", ""))
+        entries = [future.result() for future in futures]
+
+    assert sorted(lookups) == [("Autre", ""), ("Film", "2025")]
+    assert len({id(future) for future in futures}) == 2
+    assert entries[0]["rating"] == "7.0"
+
+def test_scrape_dates_schedules_pages(monkeypatch):
+    """Test que chaque page d'une unité est demandée une fois, les suivantes après la première, sans dépasser
+    le nombre de workers, et que chaque date terminée est signalée une seule fois."""
+    monkeypatch.setattr('scrape.MAX_WORKERS', 2)
+    calls, active = [], [0, 0]  # Pages en cours, maximum observé
+    lock = threading.Lock()
+
+    class PagedTheater:
+        def __init__(self, name):
+            self.name = self.id = name
+
+        def getShowtimesPage(self, date, page=1, skip_unchanged=False):
+            with lock:
+                calls.append((self.name, date.day, page))
+                active[0] += 1
+                active[1] = max(active)
+            sleep(0.01)
+            with lock:
+                active[0] -= 1
+            return [], 3
+
+    days = [datetime(2026, 10, 17), datetime(2026, 10, 18)]
+    theaters = [PagedTheater("A"), PagedTheater("B")]
+    done = []
+    enricher = SimpleNamespace(submit=lambda movie: None, enrich=lambda movies: list(movies))
+    scrape_dates({day: theaters for day in days}, lambda date, movies, fetched: done.append(date), enricher)
+
+    for name in ("A", "B"):
+        for day in days:
+            pages = [page for theater, date, page in calls if (theater, date) == (name, day.day)]
+            assert sorted(pages) == [1, 2, 3] and pages[0] == 1
+    assert active[1] == 2
+    assert sorted(done) == days
+
+def test_unit_hash_covers_film_metadata():
+    """Test que l'empreinte d'une unité change avec les métadonnées Allociné d'un film, pas avec l'ordre des pages."""
+    def showtimes(poster, want_to_see=10):
+        movie = Movie({
+            "title": "Avatar", "internalId": 1, "runtime": "3h 17min", "releaseDate": {"date": "2025-12-17"},
+            "genres": [{"translate": "Science Fiction"}], "stats": {"wantToSeeCount": want_to_see},
+            "poster": {"url": poster} if poster else None, "credits": [],
+        })
+        theater = SimpleNamespace(name="A")
+        return [Showtime({"startsAt": f"2026-10-17T{hour}:00:00"}, theater, movie) for hour in (14, 20)]
+
+    assert unit_hash(showtimes(None)) == unit_hash(showtimes(None)[::-1])
+    assert unit_hash(showtimes(None)) != unit_hash(showtimes("https://example.org/avatar.jpg"))
+    assert unit_hash(showtimes(None)) != unit_hash(showtimes(None, want_to_see=11))
+
+def test_fetch_timing_excludes_rate_limiter(monkeypatch):
+    """Test que la durée "fetch" d'un cinéma ne compte que l'appel réseau, pas l'attente du limiteur."""
+    run_metrics = Metrics()
+    monkeypatch.setattr(modules.Classes, 'metrics', run_metrics)
+    monkeypatch.setattr(modules.Classes, 'get_rate_limiter', lambda host: SimpleNamespace(acquire=lambda: sleep(0.05)))
+    session = SimpleNamespace(get=lambda url, **kwargs: SimpleNamespace(status_code=200, content=b'', headers={}))
+
+    transport = Transport()
+    monkeypatch.setattr(transport, 'session', lambda host: session)
+    transport.get('https://example.org/p-1/', stage='fetch', labels={'theater': 'A', 'page': 1})
+    summary = run_metrics.summary()
+    assert summary['stages']['http.wait']['total_s'] >= 0.05
+    assert summary['by_theater']['A']['fetch']['count'] == 1
+    assert summary['by_theater']['A']['fetch']['total_s'] < 0.05